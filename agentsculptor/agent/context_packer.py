@@ -0,0 +1,180 @@
+# agent/context_packer.py
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_CONTEXT_TOKENS = 32000
+CHARS_PER_TOKEN = 4
+# Below this many spare tokens a truncated file is more noise than signal
+MIN_PARTIAL_TOKENS = 64
+GRAPH_KEYS = ("dependency_graph", "reverse_dependencies")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting prompts."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_json(obj: Any, sort_keys: bool = False) -> str:
+    """Serialize without indentation or padding; whitespace is pure prefill cost."""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys)
+
+
+def fingerprint(text: str) -> str:
+    """Short stable hash of prompt text, e.g. to check that a prompt prefix is reused."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def context_fingerprint(context: Dict[str, Any]) -> str:
+    """Hash of a project context that does not depend on dict insertion order."""
+    return fingerprint(compact_json(context, sort_keys=True))
+
+
+def _terms(text: str) -> set:
+    words = re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text)
+    return {w.lower() for w in words if len(w) > 2}
+
+
+def rank_files(
+    context: Dict[str, Any],
+    user_request: str,
+    execution_log: Optional[List[Dict]] = None,
+) -> List[str]:
+    """
+    Order the context's files by relevance to the request and the execution history.
+
+    Files named in the request or touched by earlier steps come first, then files
+    whose module name, path components or top-level definitions share words with
+    the request. Ties keep path order so the ranking is deterministic.
+    """
+    request = user_request or ""
+    request_terms = _terms(request)
+
+    history_paths = {}
+    for step in execution_log or []:
+        path = (step.get("args") or {}).get("path")
+        if not path:
+            continue
+        weight = 6 if step.get("status") == "error" else 4
+        history_paths[path.strip("/")] = max(weight, history_paths.get(path.strip("/"), 0))
+
+    def score(path: str, info: Dict[str, Any]) -> int:
+        total = 0
+        if path in request:
+            total += 10
+        elif os.path.basename(path) in request:
+            total += 5
+
+        for hist_path, weight in history_paths.items():
+            if path == hist_path:
+                total += weight
+            elif hist_path and path.startswith(hist_path + "/"):
+                total += weight // 2
+
+        stem = os.path.splitext(os.path.basename(path))[0].lower()
+        if stem in request_terms:
+            total += 3
+        total += sum(1 for part in path.lower().split("/")[:-1] if part in request_terms)
+
+        for key in ("functions", "classes"):
+            for item in info.get(key) or []:
+                name = item.get("name", "") if isinstance(item, dict) else str(item)
+                if name.lower() in request_terms:
+                    total += 2
+        return total
+
+    files = context.get("files", {})
+    scored = [(score(path, info), path) for path, info in files.items()]
+    return [path for _, path in sorted(scored, key=lambda item: (-item[0], item[1]))]
+
+
+def pack_context(
+    context: Dict[str, Any],
+    user_request: str,
+    execution_log: Optional[List[Dict]] = None,
+    token_budget: int = DEFAULT_CONTEXT_TOKENS,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Serialize the project context into compact JSON that fits ``token_budget``.
+
+    Metadata for every file is kept while it fits; file contents are then added
+    in relevance order, truncating the last one that only partially fits. If
+    even the metadata is too large, the least relevant files are dropped.
+
+    Returns the packed JSON string and stats with the estimated tokens used and
+    dropped.
+    """
+    files = context.get("files", {})
+    ranked = rank_files(context, user_request, execution_log)
+
+    # The graphs are folded into per-file "imported_by" lists so dropping a
+    # file's metadata also drops its edges
+    reverse = context.get("reverse_dependencies", {})
+    light_files = {}
+    for path, info in files.items():
+        light_files[path] = {k: v for k, v in info.items() if k != "content"}
+        if reverse.get(path):
+            light_files[path]["imported_by"] = reverse[path]
+    packed = {k: v for k, v in context.items() if k != "files" and k not in GRAPH_KEYS}
+    packed["files"] = light_files
+
+    dropped = 0
+    files_dropped = 0
+    used = estimate_tokens(compact_json(packed))
+
+    # Drop metadata of the least relevant files until the skeleton fits. Per-file
+    # costs are estimated, so re-measure once and keep dropping if still over.
+    drop_order = list(reversed(ranked))
+    while used > token_budget and drop_order:
+        while used > token_budget and drop_order:
+            path = drop_order.pop(0)
+            cost = estimate_tokens(compact_json({path: light_files[path]}))
+            del light_files[path]
+            used -= cost
+            dropped += cost + estimate_tokens(compact_json(files[path].get("content", "")))
+            files_dropped += 1
+        used = estimate_tokens(compact_json(packed))
+
+    with_content = 0
+    truncated = 0
+    for path in ranked:
+        if path not in light_files:
+            continue
+        content = files[path].get("content")
+        if not content:
+            continue
+        cost = estimate_tokens(compact_json(content)) + 3
+        remaining = token_budget - used
+        if cost <= remaining:
+            light_files[path]["content"] = content
+            used += cost
+            with_content += 1
+        elif remaining >= MIN_PARTIAL_TOKENS:
+            keep_chars = (remaining - 8) * CHARS_PER_TOKEN
+            partial = content[:keep_chars]
+            # Escaping can make the JSON longer than the raw text, shrink until it fits
+            while partial and estimate_tokens(compact_json(partial)) + 8 > remaining:
+                partial = partial[: len(partial) * 3 // 4]
+            light_files[path]["content"] = partial
+            light_files[path]["truncated"] = True
+            partial_cost = estimate_tokens(compact_json(partial)) + 8
+            used += partial_cost
+            dropped += max(cost - partial_cost, 0)
+            with_content += 1
+            truncated += 1
+        else:
+            dropped += cost
+
+    # Sorted keys: the same context always serializes to the same bytes
+    text = compact_json(packed, sort_keys=True)
+    stats = {
+        "token_budget": token_budget,
+        "tokens_used": estimate_tokens(text),
+        "tokens_dropped": dropped,
+        "files_with_content": with_content,
+        "files_truncated": truncated,
+        "files_dropped": files_dropped,
+    }
+    return text, stats
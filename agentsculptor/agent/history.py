@@ -0,0 +1,88 @@
+# agent/history.py
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+from agentsculptor.agent.context_packer import compact_json, estimate_tokens
+
+DEFAULT_HISTORY_TOKENS = 2000
+MAX_ERROR_CHARS = 200
+MAX_VALUE_CHARS = 160
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def content_digest(text: str) -> str:
+    """Short content fingerprint standing in for file contents in the history."""
+    digest = hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()[:12]
+    return f"sha256:{digest} ({len(text)} chars)"
+
+
+def summarize_step(index: int, entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One-line summary of an execution log entry: tool, path, status, a short
+    error and other arguments abbreviated. Large string arguments such as a
+    ``create_file`` ``content`` are replaced by their hash and length.
+    """
+    args = entry.get("args") or {}
+    summary = {"step": index, "tool": entry.get("tool"), "status": entry.get("status")}
+    if "path" in args:
+        summary["path"] = args["path"]
+    for key, value in args.items():
+        if key == "path":
+            continue
+        if key == "content" and isinstance(value, str):
+            summary[key] = content_digest(value)
+        else:
+            summary[key] = _shorten(value if isinstance(value, str) else compact_json(value), MAX_VALUE_CHARS)
+    if entry.get("error"):
+        summary["error"] = _shorten(entry["error"], MAX_ERROR_CHARS)
+    result = entry.get("result")
+    if result is not None:
+        summary["result"] = _shorten(result if isinstance(result, str) else compact_json(result), MAX_VALUE_CHARS)
+    return summary
+
+
+def compact_history(
+    execution_log: Optional[List[Dict]],
+    token_budget: int = DEFAULT_HISTORY_TOKENS,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Render the execution log as one compact JSON summary per line, within
+    ``token_budget`` (estimated) tokens.
+
+    Failed steps are kept first, then the most recent ones; steps that do
+    not fit are counted in a leading ``omitted`` line. Kept steps stay in
+    execution order.
+    """
+    summaries = [compact_json(summarize_step(i, entry)) for i, entry in enumerate(execution_log or [])]
+    failed = {i for i, entry in enumerate(execution_log or []) if entry.get("status") == "error"}
+    priority = sorted(range(len(summaries)), key=lambda i: (i not in failed, -i))
+
+    # Reserve room for the omitted-steps line so it never pushes us over budget
+    reserve = estimate_tokens(compact_json({"omitted_steps": len(summaries), "failed": len(failed)})) + 1
+    used = 0
+    kept = set()
+    for i in priority:
+        cost = estimate_tokens(summaries[i]) + 1
+        if used + cost + reserve > token_budget:
+            continue
+        kept.add(i)
+        used += cost
+
+    lines = []
+    omitted = len(summaries) - len(kept)
+    if omitted:
+        lines.append(compact_json({"omitted_steps": omitted, "failed": len(failed - kept)}))
+    lines.extend(summaries[i] for i in sorted(kept))
+    text = "\n".join(lines)
+
+    stats = {
+        "steps": len(summaries),
+        "steps_included": len(kept),
+        "steps_omitted": omitted,
+        "token_budget": token_budget,
+        "tokens_used": estimate_tokens(text),
+    }
+    return text, stats
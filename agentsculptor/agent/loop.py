@@ -1,11 +1,19 @@
 # agent/loop.py
+import asyncio
 import os
 import sys
-import subprocess
-from agentsculptor.utils.file_ops import write_file, backup_file
-from agentsculptor.tools.update_imports import update_imports
-from agentsculptor.tools.run_tests import run_tests
+import time
+from agentsculptor.utils.file_ops import write_file, modify_file, backup_file
+from agentsculptor.tools.update_imports import update_imports_async
+from agentsculptor.tools.run_tests import run_tests, TestRunner
+from agentsculptor.tools.format_code import format_code
 from agentsculptor.tools.refactor_code import RefactorCodeTool
+from agentsculptor.tools.prepare_context import update_context_files
+from agentsculptor.agent.scheduler import StepScheduler
+from agentsculptor.utils.workspace import Workspace
+from agentsculptor.utils.file_store import FileStore
+from agentsculptor.utils.ignore import IgnoreRules
+from agentsculptor.utils.dependency_graph import build_module_index, update_dependency_graph
 from agentsculptor.utils.logging import setup_logging, get_logger
 
 setup_logging(level="DEBUG")
@@ -23,26 +31,57 @@ def safe_tool(func):
     return wrapper
 
 
-def make_tool_functions(project_path, context, refactor_tool, analysis_cache):
+# Tools whose ``path`` argument is written to when they succeed
+MODIFYING_TOOLS = {"create_file", "modify_file", "refactor_code", "update_imports"}
+
+
+def make_tool_functions(
+    project_path,
+    context,
+    refactor_tool,
+    analysis_cache,
+    changed_files=None,
+    test_runner=None,
+    staged=False,
+    store=None,
+):
+    changed_files = changed_files if changed_files is not None else set()
+    if staged:
+        # Writes only reach the project when the workspace is committed: nothing to back up
+        backup = lambda path: f"{path} is staged in the run workspace; no backup needed"
+    else:
+        backup = lambda path: backup_file(os.path.join(project_path, path))
     return {
         "create_file": safe_tool(
-            lambda path, content: write_file(os.path.join(project_path, path), content)
+            lambda path, content: write_file(os.path.join(project_path, path), content, store=store)
         ),
 
-        "backup_file": safe_tool(
-            lambda path: backup_file(os.path.join(project_path, path))
+        "modify_file": safe_tool(
+            lambda path, content: modify_file(os.path.join(project_path, path), content, store=store)
         ),
 
+        "backup_file": safe_tool(backup),
+
         "update_imports": safe_tool(
-            lambda path, instruction: update_imports(project_path, path, instruction, context=context)
+            lambda path, instruction: asyncio.run(
+                update_imports_async(project_path, path, instruction, context=context, store=store)
+            )
         ),
 
         "run_tests": safe_tool(
-            lambda: run_tests(project_path)
+            lambda path=None, full_suite=False: run_tests(
+                project_path,
+                changed_files=sorted(changed_files),
+                context=context,
+                full_suite=full_suite,
+                paths=[path] if path else None,
+                runner=test_runner,
+                store=store,
+            )
         ),
 
         "format_code": safe_tool(
-            lambda path=None: subprocess.run(["black", project_path], check=True)
+            lambda path=None: format_code(project_path, path, changed_files=sorted(changed_files), store=store)
         ),
 
         "refactor_code": safe_tool(
@@ -87,60 +126,214 @@ def run_loop(project_path, context, plan):
 
 
 class AgentLoop:
-    def __init__(self, planner, context, user_request, project_path):
+    def __init__(
+        self,
+        planner,
+        context,
+        user_request,
+        project_path,
+        stream_plan=False,
+        step_workers=None,
+        test_workers=None,
+        warm_tests=None,
+        workspace=None,
+        ignore_rules=None,
+    ):
         self.planner = planner
         self.context = context
         self.user_request = user_request
         self.project_path = project_path
+        # Dispatch tool calls while the planner is still generating the rest of the plan
+        self.stream_plan = stream_plan
+        # Independent plan steps (different paths) run concurrently; 1 keeps them sequential
+        self.step_workers = step_workers or int(os.environ.get("AGENTSCULPTOR_STEP_WORKERS", 4))
         self.execution_log = []
         self.analysis_cache = {}
-        self.refactor_tool = RefactorCodeTool()
+        # Project paths written by successful steps of this run (tests are selected from these)
+        self.changed_files = set()
+        # Tools write to a copy-on-write overlay, committed at the end of the run
+        self.workspace = self._open_workspace(
+            workspace if workspace is not None else os.environ.get("AGENTSCULPTOR_WORKSPACE", "1") != "0"
+        )
+        self.work_path = self.workspace.path if self.workspace else project_path
+        # Outcome of the last run_tests step; failing tests roll the workspace back
+        self.tests_failed = False
+        # Shared by every run_tests step, so warm pytest workers survive across iterations
+        self.test_runner = TestRunner(self.work_path, workers=test_workers, persistent=warm_tests)
+        # Files shared by all tools: read from disk at most once, seeded with the context's contents
+        self.store = FileStore(self.work_path)
+        seeded = self.store.seed_context(self.context)
+        logger.debug(f"[DEBUG] File store seeded with {seeded} files from the project context.")
+        # Rules of the initial scan, so refreshes leave out what it left out
+        self.ignore_rules = ignore_rules or IgnoreRules(project_path)
+        # Module index of the context, kept up to date by incremental refreshes
+        self.module_index = build_module_index(self.context.get("files", {}))
+        self.refactor_tool = RefactorCodeTool(store=self.store)
         self.tool_functions = make_tool_functions(
-            project_path=self.project_path,
+            project_path=self.work_path,
             context=self.context,
             refactor_tool=self.refactor_tool,
             analysis_cache=self.analysis_cache,
+            changed_files=self.changed_files,
+            test_runner=self.test_runner,
+            staged=self.workspace is not None,
+            store=self.store,
         )
 
-    def dispatch_tool_call(self, call):
+    def _open_workspace(self, enabled):
+        if not enabled:
+            return None
+        workspace = Workspace(self.project_path)
+        try:
+            workspace.open()
+        except OSError as e:
+            logger.warning(f"[WARN] Could not create the run workspace, writing to the project directly: {e}")
+            workspace.close()
+            if hasattr(self.planner, "transactional"):
+                self.planner.transactional = False
+            return None
+        return workspace
+
+    def _finish_workspace(self, completed):
+        """
+        Commit the files the tools wrote, or roll them back if the run broke
+        off or the last tests failed. Other files created in the workspace
+        (test caches, coverage data, test output) are discarded with it.
+        """
+        if self.workspace is None:
+            return
+        try:
+            if completed and not self.tests_failed:
+                self.workspace.commit(self.store.written())
+            else:
+                reason = "the last test run failed" if completed else "the run did not complete"
+                logger.warning(f"[WARN] Rolling back staged changes: {reason}.")
+                self.workspace.rollback(self.store.written())
+        finally:
+            self.workspace.close()
+
+    def _execute(self, call):
+        # Runs in a scheduler worker: record changes before dependent steps can start
         result = dispatch_tool_call(self.tool_functions, call)
+        path = (result.get("args") or {}).get("path")
+        if result["status"] == "success" and result["tool"] in MODIFYING_TOOLS and path is not None:
+            self.changed_files.add(path)
+        return result
+
+    def dispatch_tool_call(self, call):
+        result = self._execute(call)
         self.execution_log.append(result)
         return result
 
+    def _planning_failed(self, error):
+        logger.fatal(f"Could not generate plan: {error}")
+        if isinstance(error, ValueError):
+            print("The planner's response could not be parsed as a plan.")
+        else:
+            print("Please check that vLLM is running and reachable at your VLLM_URL.")
+        sys.exit(1)
+
+    def _stream_plan(self, **kwargs):
+        # Streaming and parse errors surface while iterating, not when the plan is requested
+        try:
+            yield from self.planner.stream_tool_calls(**kwargs)
+        except (RuntimeError, ValueError) as e:  # ValueError includes json.JSONDecodeError
+            self._planning_failed(e)
+
+    def _generate_plan(self):
+        kwargs = {
+            "context": self.context,
+            "user_request": self.user_request,
+            "execution_log": self.execution_log,
+        }
+        if self.stream_plan:
+            if getattr(self.planner, "plan_samples", 1) > 1:
+                logger.debug("[DEBUG] Streaming the plan: best-of-N plan sampling is not used.")
+            return self._stream_plan(**kwargs)
+        return self.planner.generate_tool_calls(**kwargs)
+
+    def _refresh_context(self):
+        """
+        Re-analyze only the files written since the last refresh and patch the
+        context (entries and dependency graph) in place, so the next plan sees
+        the current code without walking the project again.
+        """
+        changed = self.store.drain_changes()
+        if not changed:
+            return
+        started = time.perf_counter()
+        updated = update_context_files(self.context, self.store, changed, ignore_rules=self.ignore_rules)
+        relinked = update_dependency_graph(self.context, updated, self.module_index)
+        logger.debug(
+            f"[DEBUG] Refreshed {len(updated)} context entries and the imports of {len(relinked)} files "
+            f"in {time.perf_counter() - started:.3f}s: {', '.join(updated)}"
+        )
+
     def run(self, max_iterations=3):
+        completed = False
+        try:
+            self._run(max_iterations)
+            completed = True
+        finally:
+            self.test_runner.close()
+            self._finish_workspace(completed)
+            stats = self.store.stats()
+            logger.debug(
+                f"[DEBUG] File store: {stats['files']} files, {stats['disk_reads']} disk reads, "
+                f"{stats['hits']} cache hits."
+            )
+
+    def _run(self, max_iterations):
         for iteration in range(max_iterations):
             logger.iteration(iteration+1, "Planning...")
+            self._refresh_context()
 
             try:
-                plan = self.planner.generate_tool_calls(
-                    context=self.context,
-                    user_request=self.user_request,
-                    execution_log=self.execution_log,
-                )
-            except RuntimeError as e:
-                logger.fatal(f"Could not generate plan: {e}")
-                print("Please check that vLLM is running and reachable at your VLLM_URL.")
-                sys.exit(1)
-
-            if not plan:
-                logger.stop("Planner returned no further actions. Exiting early.")
-                break
+                plan = self._generate_plan()
+            except (RuntimeError, ValueError) as e:
+                self._planning_failed(e)
 
             all_success = True
-            for call in plan:
-                tool = call.get("tool")
-                args = call.get("args", {})
-
-                if tool == "noop":
-                    logger.noop(f"{args.get('reason', 'Planner decided no action is possible.')}")
-                    # stop iterating further
-                    return
-                result = self.dispatch_tool_call(call)
+            executed = 0
+            noop_reason = None
+
+            def record(call, result):
+                nonlocal all_success
+                self.execution_log.append(result)
+                if result["tool"] == "run_tests" and result["status"] == "success":
+                    self.tests_failed = result["result"].get("status") == "failed"
+                    if self.tests_failed:
+                        # Re-plan so the next iteration can fix the tests before anything is rolled back
+                        all_success = False
                 status = result["status"].upper()
                 print(f"[{status}] {result['tool']} → {result.get('error', '') or 'ok'}")
                 if result["status"] != "success":
                     all_success = False
 
+            with StepScheduler(
+                self._execute,
+                record,
+                workers=self.step_workers,
+            ) as scheduler:
+                for call in plan:
+                    executed += 1
+                    tool = call.get("tool")
+                    args = call.get("args", {})
+
+                    if tool == "noop":
+                        noop_reason = args.get("reason", "Planner decided no action is possible.")
+                        break
+                    scheduler.add(call)
+
+            if noop_reason is not None:
+                logger.noop(f"{noop_reason}")
+                # stop iterating further
+                return
+
+            if not executed:
+                logger.stop("Planner returned no further actions. Exiting early.")
+                break
+
             if all_success:
                 logger.stop("All actions succeeded, stopping early.")
                 break
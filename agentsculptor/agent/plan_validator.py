@@ -0,0 +1,105 @@
+# agent/plan_validator.py
+import posixpath
+from typing import Any, Dict, List, Optional
+from agentsculptor.tools.registry import TOOL_SCHEMAS
+
+# Tools that act on an existing file or folder
+EXISTING_PATH_TOOLS = {"modify_file", "backup_file", "update_imports"}
+# Tools that may create the file at ``path`` (``refactor_code`` writes new files when asked to)
+CREATING_TOOLS = {"create_file", "refactor_code"}
+# ``noop`` is handled by the agent loop itself, not registered as a tool
+PLAN_SCHEMAS = {**TOOL_SCHEMAS, "noop": {"properties": {"reason": "string"}, "required": []}}
+# Python types accepted for each JSON schema type (bool is not an integer here)
+JSON_TYPES = {
+    "string": (str,),
+    "boolean": (bool,),
+    "integer": (int,),
+    "number": (int, float),
+    "array": (list,),
+    "object": (dict,),
+}
+
+
+def _norm(path: str) -> str:
+    path = posixpath.normpath(str(path).replace("\\", "/")).strip("/")
+    return "" if path == "." else path
+
+
+def _has_type(value: Any, json_type: str) -> bool:
+    if isinstance(value, bool) and json_type != "boolean":
+        return False
+    return isinstance(value, JSON_TYPES.get(json_type, (object,)))
+
+
+def known_paths(context: Dict[str, Any], execution_log: Optional[List[Dict]] = None) -> set:
+    """Files and folders of the project context plus files created by earlier steps."""
+    paths = {_norm(p) for p in context.get("files", {})}
+    paths.update(_norm(p) for p in context.get("folders", []))
+    for entry in execution_log or []:
+        path = (entry.get("args") or {}).get("path")
+        if entry.get("tool") in CREATING_TOOLS and entry.get("status") == "success" and path:
+            paths.add(_norm(path))
+    return paths
+
+
+def validate_plan(
+    plan: List[Any],
+    context: Dict[str, Any],
+    execution_log: Optional[List[Dict]] = None,
+) -> List[List[str]]:
+    """
+    Check every step against the schema generated from ``TOOL_REGISTRY``
+    and against the project context.
+
+    Returns one list of problems per step (empty when the step looks valid):
+    unknown tools, missing, unexpected or mistyped arguments, and paths that
+    do not exist yet for tools that need an existing file. Files created by
+    earlier steps of the same plan (``create_file`` or ``refactor_code``)
+    count as existing.
+    """
+    existing = known_paths(context, execution_log)
+    issues = []
+    for step in plan:
+        problems = []
+        issues.append(problems)
+        if not isinstance(step, dict):
+            problems.append("step is not a JSON object")
+            continue
+        tool = step.get("tool") or step.get("action")
+        args = step.get("args", {})
+        if not isinstance(args, dict):
+            problems.append("'args' is not a JSON object")
+            continue
+
+        schema = PLAN_SCHEMAS.get(tool)
+        if schema is None:
+            problems.append(f"unknown tool '{tool}'")
+            continue
+
+        properties = schema["properties"]
+        problems.extend(f"missing argument '{name}'" for name in schema["required"] if name not in args)
+        for name, value in args.items():
+            expected = properties.get(name)
+            if expected is None:
+                problems.append(f"unexpected argument '{name}'")
+            elif not _has_type(value, expected):
+                problems.append(f"argument '{name}' must be a {expected}")
+
+        path = args.get("path")
+        if isinstance(path, str):
+            if tool in CREATING_TOOLS:
+                existing.add(_norm(path))
+            elif tool in EXISTING_PATH_TOOLS and _norm(path) not in existing:
+                problems.append(f"path '{path}' does not exist in the project")
+    return issues
+
+
+def score_plan(plan: List[Any], issues: List[List[str]]) -> float:
+    """
+    Higher is better: every problem costs 10 points, and a plan that does
+    something beats a bare noop. Empty plans score lowest.
+    """
+    if not plan:
+        return -100.0
+    acting = any(isinstance(step, dict) and step.get("tool") != "noop" for step in plan)
+    return -10.0 * sum(len(problems) for problems in issues) + (1.0 if acting else 0.0)
@@ -1,10 +1,25 @@
 # agent/planner.py
 import json
-from typing import Any, Dict, List, Optional
+import re
+from typing import Any, Dict, Iterator, List, Optional
 from agentsculptor.llm.client import VLLMClient
-from agentsculptor.llm.prompts import planner_system_prompt
+from agentsculptor.llm.prompts import planner_system_prompt, build_plan_repair_messages
+from agentsculptor.agent.context_packer import (
+    pack_context,
+    compact_json,
+    estimate_tokens,
+    fingerprint,
+    context_fingerprint,
+    DEFAULT_CONTEXT_TOKENS,
+)
+from agentsculptor.agent.history import compact_history, DEFAULT_HISTORY_TOKENS
+from agentsculptor.agent.plan_validator import validate_plan, score_plan
+from agentsculptor.utils.logging import setup_logging, get_logger
 import os
 
+setup_logging("DEBUG")
+logger = get_logger()
+
 def summarize_context(context: Dict[str, Any], max_files: int = 20, max_chars_per_file: int = 10000) -> str:
     lines = []
     files = context.get("files", {})
@@ -66,46 +81,273 @@ def summarize_context_without_content(context: Dict[str, Any]) -> Dict[str, Any]
     return light_context
 
 
-def _extract_json_from_text(text: str) -> Optional[str]:
-    text = text.strip()
-    try:
-        json.loads(text)
-        return text
-    except Exception:
-        pass
-
-    open_idx = None
-    for i, ch in enumerate(text):
-        if ch in ("{", "["):
-            open_idx = i
-            open_ch = ch
-            break
-    if open_idx is None:
-        return None
-
-    close_ch = "}" if open_ch == "{" else "]"
+# Only brackets that can start a JSON value; prose like "{note}" or "[see above]" is skipped
+# without a decode attempt (each failed attempt costs O(offset) for its error position)
+_JSON_OPENER = re.compile(r'\{\s*["}]|\[\s*(?:[\[\]{"\-\d]|true|false|null)')
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _is_tool_call(value: Any) -> bool:
+    return isinstance(value, dict) and ("tool" in value or "action" in value)
 
+
+def _looks_like_plan(value: Any) -> bool:
+    return _is_tool_call(value) or (
+        isinstance(value, list) and all(_is_tool_call(item) for item in value)
+    )
+
+
+def _skip_span(text: str, start: int) -> int:
+    """
+    End of the bracketed span opened at ``start`` (string-aware), or the end
+    of ``text`` when it is never closed, e.g. a plan cut off at max_tokens.
+    """
     depth = 0
-    for i in range(open_idx, len(text)):
-        if text[i] == open_ch:
+    in_string = escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
             depth += 1
-        elif text[i] == close_ch:
+        elif ch in "}]":
             depth -= 1
             if depth == 0:
-                candidate = text[open_idx: i + 1]
-                try:
-                    json.loads(candidate)
-                    return candidate
-                except Exception:
-                    continue
-    return None
+                return i + 1
+    return len(text)
+
+
+def _extract_json_from_text(text: str) -> Optional[str]:
+    """
+    Return the first JSON block in ``text`` that looks like a plan: a tool
+    call or a list of tool calls (objects with a "tool" or "action" key).
+
+    Each ``[``/``{`` is tried with ``JSONDecoder.raw_decode``, which is
+    string-aware and stops at the end of the value. A block is skipped as a
+    whole, whether it decoded or not, so the braces inside code-laden
+    ``content`` arguments are never re-parsed and no step of a broken or
+    truncated plan is mistaken for the whole plan.
+    """
+    pos = 0
+    while True:
+        match = _JSON_OPENER.search(text, pos)
+        if match is None:
+            return None
+        start = match.start()
+        try:
+            value, end = _JSON_DECODER.raw_decode(text, start)
+        except ValueError:
+            pos = _skip_span(text, start)
+            continue
+        if _looks_like_plan(value):
+            return text[start:end]
+        pos = end
+
+
+def _parse_plan(response: str) -> List[Dict]:
+    """Extract the plan from a planner response; an empty plan becomes a noop."""
+    json_snippet = _extract_json_from_text(response)
+    if not json_snippet:
+        raise ValueError(f"No JSON could be extracted:\n{response}")
+    plan = json.loads(json_snippet)
+    if isinstance(plan, dict):
+        plan = [plan]
+
+    if not plan:  # empty list case
+        return [{"tool": "noop", "args": {"reason": "Planner returned no actions."}}]
+    return plan
+
+
+class PlanStreamParser:
+    """
+    Incrementally extract the elements of a streamed JSON array of tool calls.
+
+    Text before the opening ``[`` is ignored. Each ``feed`` scans only the new
+    characters (tracking string literals so braces inside code arguments do
+    not count) and returns the tool calls completed by that chunk.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.finished = False
+        self.element_start = None
+        self.malformed = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        self.buffer += chunk
+        calls = []
+        buf = self.buffer
+        i = self.pos
+        while i < len(buf) and not self.finished:
+            ch = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif not self.started:
+                if ch == "[":
+                    self.started = True
+                    self.depth = 1
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if self.depth == 1 and ch == "{":
+                    self.element_start = i
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 1 and ch == "}" and self.element_start is not None:
+                    try:
+                        calls.append(json.loads(buf[self.element_start:i + 1]))
+                    except ValueError:
+                        self.malformed = True
+                    self.element_start = None
+                elif self.depth == 0:
+                    self.finished = True
+            i += 1
+        self.pos = i
+        return calls
+
 
 class PlannerAgent:
-    def __init__(self, base_url=None, model=None):
+    def __init__(
+        self,
+        base_url=None,
+        model=None,
+        context_token_budget=None,
+        history_token_budget=None,
+        stable_prefix=None,
+        emit_fingerprint=None,
+        plan_samples=None,
+        sample_temperature=None,
+        repair_plans=None,
+        repair_max_tokens=None,
+        transactional=None,
+    ):
         # Read from environment if not explicitly passed
         self.base_url = (base_url or os.environ.get("VLLM_URL", "http://localhost:8008")).rstrip("/")
         self.model = model or os.environ.get("VLLM_MODEL", "openai/gpt-oss-120b")
+        self.context_token_budget = context_token_budget or int(
+            os.environ.get("AGENTSCULPTOR_CONTEXT_TOKENS", DEFAULT_CONTEXT_TOKENS)
+        )
+        self.history_token_budget = history_token_budget or int(
+            os.environ.get("AGENTSCULPTOR_HISTORY_TOKENS", DEFAULT_HISTORY_TOKENS)
+        )
+        # Pack the context once per request (not per iteration) so every planning call
+        # shares a byte-identical system+context prefix that vLLM can prefix-cache
+        self.stable_prefix = (
+            stable_prefix if stable_prefix is not None
+            else os.environ.get("AGENTSCULPTOR_STABLE_PREFIX", "1") != "0"
+        )
+        # Log the prefix fingerprint of every prompt to correlate with vLLM prefix-cache metrics
+        self.emit_fingerprint = (
+            emit_fingerprint if emit_fingerprint is not None
+            else os.environ.get("AGENTSCULPTOR_PREFIX_FINGERPRINT", "0") == "1"
+        )
+        # Best-of-N planning: sample several plans in one request and keep the best-validated one
+        self.plan_samples = max(plan_samples or int(os.environ.get("AGENTSCULPTOR_PLAN_SAMPLES", 1)), 1)
+        self.sample_temperature = (
+            sample_temperature if sample_temperature is not None
+            else float(os.environ.get("AGENTSCULPTOR_PLAN_TEMPERATURE", 0.7))
+        )
+        # Steps failing local validation are sent back for a targeted repair before execution
+        self.repair_plans = (
+            repair_plans if repair_plans is not None
+            else os.environ.get("AGENTSCULPTOR_PLAN_REPAIR", "1") != "0"
+        )
+        self.repair_max_tokens = repair_max_tokens or int(os.environ.get("AGENTSCULPTOR_REPAIR_MAX_TOKENS", 4096))
+        # Tools write to a run workspace that is rolled back on failure: no backup steps needed
+        self.transactional = (
+            transactional if transactional is not None
+            else os.environ.get("AGENTSCULPTOR_WORKSPACE", "1") != "0"
+        )
         self.client = VLLMClient(base_url=self.base_url, model=self.model)
+        self.last_pack_stats = None
+        self._packed = None
+        # Estimated size of every planner prompt sent, one entry per planning call
+        self.prompt_sizes = []
+
+    def _pack(self, context, user_request, execution_log, token_budget):
+        if not self.stable_prefix:
+            return pack_context(context, user_request, execution_log, token_budget=token_budget)
+
+        # Ranked on the request alone: the history changes every iteration, the prefix must not
+        key = (context_fingerprint(context), user_request, token_budget)
+        if self._packed is None or self._packed[0] != key:
+            self._packed = (key, pack_context(context, user_request, None, token_budget=token_budget))
+        return self._packed[1]
+
+    def _build_messages(self, context, user_request, execution_log, context_token_budget):
+        packed_context, stats = self._pack(
+            context,
+            user_request,
+            execution_log,
+            context_token_budget or self.context_token_budget,
+        )
+        self.last_pack_stats = stats
+        logger.debug(
+            f"[DEBUG] Packed context: ~{stats['tokens_used']}/{stats['token_budget']} tokens, "
+            f"{stats['tokens_dropped']} dropped ({stats['files_with_content']} files with content, "
+            f"{stats['files_truncated']} truncated, {stats['files_dropped']} omitted)."
+        )
+
+        # Fixed prefix: instructions + project context. Variable suffix: request + history.
+        system_prompt = f"{planner_system_prompt(self.transactional)}\n\nPROJECT CONTEXT:\n{packed_context}\n"
+        user_prompt = f"USER REQUEST:\n{user_request}\n"
+        history_stats = None
+        if execution_log:
+            history, history_stats = compact_history(execution_log, self.history_token_budget)
+            user_prompt += f"\nEXECUTION HISTORY (one step per line):\n{history}\n"
+
+        self._record_prompt_size(system_prompt, stats, history_stats, user_prompt)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _record_prompt_size(self, system_prompt, pack_stats, history_stats, user_prompt):
+        sizes = {
+            "prefix_tokens": estimate_tokens(system_prompt),
+            "context_tokens": pack_stats["tokens_used"],
+            "suffix_tokens": estimate_tokens(user_prompt),
+            "history_tokens": history_stats["tokens_used"] if history_stats else 0,
+            "history_steps": history_stats["steps_included"] if history_stats else 0,
+            "history_omitted": history_stats["steps_omitted"] if history_stats else 0,
+            "total_tokens": estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+            "prefix_fingerprint": fingerprint(system_prompt),
+        }
+        reused = bool(self.prompt_sizes) and self.prompt_sizes[-1]["prefix_fingerprint"] == sizes["prefix_fingerprint"]
+        self.prompt_sizes.append(sizes)
+        logger.info(
+            f"[INFO] Planner prompt #{len(self.prompt_sizes)}: ~{sizes['total_tokens']} tokens "
+            f"(prefix {sizes['prefix_tokens']} incl. context {sizes['context_tokens']}, "
+            f"history {sizes['history_tokens']} for {sizes['history_steps']} steps"
+            + (f", {sizes['history_omitted']} omitted" if sizes["history_omitted"] else "")
+            + ")."
+        )
+        message = (
+            f"Prompt prefix fingerprint {sizes['prefix_fingerprint']} "
+            f"(~{sizes['prefix_tokens']} tokens, {'same as previous call' if reused else 'new'})."
+        )
+        if self.emit_fingerprint:
+            logger.info(f"[INFO] {message}")
+        else:
+            logger.debug(f"[DEBUG] {message}")
 
     def generate_tool_calls(
         self,
@@ -113,32 +355,202 @@ class PlannerAgent:
         user_request: str,
         execution_log: Optional[List[Dict]] = None,
         max_tokens: int = 10000,
-        temperature: float = 0.0
+        temperature: float = 0.0,
+        context_token_budget: Optional[int] = None,
     ) -> List[Dict]:
-        system_prompt = planner_system_prompt()
+        messages = self._build_messages(context, user_request, execution_log, context_token_budget)
+        if self.plan_samples > 1:
+            plan = self._best_of_n(messages, context, execution_log, max_tokens)
+        else:
+            response = self.client.chat(
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+            plan = _parse_plan(response)
+        return self._repair_plan(plan, messages, context, execution_log)
+
+    def _repair_plan(self, plan, messages, context, execution_log) -> List[Dict]:
+        """
+        Validate ``plan`` locally and, if some steps are invalid, ask the planner
+        to rewrite only those steps. Repaired steps replace the originals when
+        they have fewer problems; a noop replacement drops the step. Any failure
+        of the repair call leaves the plan unchanged.
+        """
+        if not self.repair_plans:
+            return plan
+        issues = validate_plan(plan, context, execution_log)
+        invalid = [index for index, problems in enumerate(issues) if problems]
+        if not invalid:
+            return plan
 
+        logger.info(f"[INFO] {len(invalid)} of {len(plan)} plan steps failed validation; asking for a repair.")
+        invalid_steps = [
+            compact_json({"step": index, "call": plan[index], "problems": issues[index]})
+            for index in invalid
+        ]
+        try:
+            response = self.client.chat(
+                messages=build_plan_repair_messages(messages, invalid_steps),
+                max_tokens=self.repair_max_tokens,
+                temperature=0.0,
+            )
+            fixes = _parse_plan(response)
+        except (RuntimeError, ValueError) as e:
+            logger.warning(f"[WARN] Plan repair failed, keeping the plan as generated: {e}")
+            return plan
+        if len(fixes) != len(invalid):
+            logger.warning(
+                f"[WARN] Plan repair returned {len(fixes)} steps for {len(invalid)} invalid ones; "
+                "keeping the plan as generated."
+            )
+            return plan
 
-        user_prompt = (
-            f"PROJECT CONTEXT:\n{json.dumps(context, indent=2)}\n\n"
-            f"USER REQUEST:\n{user_request}\n"
+        repaired = list(plan)
+        for index, fix in zip(invalid, fixes):
+            repaired[index] = fix
+        new_issues = validate_plan(repaired, context, execution_log)
+        fixed = dropped = 0
+        for index in invalid:
+            fix = repaired[index]
+            if isinstance(fix, dict) and fix.get("tool") == "noop":
+                repaired[index] = None
+                dropped += 1
+            elif len(new_issues[index]) > len(issues[index]):
+                repaired[index] = plan[index]
+            elif not new_issues[index]:
+                fixed += 1
+
+        logger.info(
+            f"[INFO] Plan repair: {fixed} steps fixed, {dropped} dropped, "
+            f"{len(invalid) - fixed - dropped} still invalid."
         )
-        if execution_log:
-            user_prompt += f"\nEXECUTION HISTORY:\n{json.dumps(execution_log, indent=2)}\n"
+        repaired = [step for step in repaired if step is not None]
+        return repaired or [{"tool": "noop", "args": {"reason": "Planner dropped every invalid step."}}]
 
-        response = self.client.chat(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+    def _best_of_n(self, messages, context, execution_log, max_tokens) -> List[Dict]:
+        """
+        Sample ``plan_samples`` plans in one batched request, validate each
+        locally and return the best-scoring one (earliest sample on ties).
+        """
+        responses = self.client.chat_n(
+            messages=messages,
+            n=self.plan_samples,
+            max_tokens=max_tokens,
+            temperature=self.sample_temperature,
+        )
+        best = None
+        scores = []
+        for index, response in enumerate(responses):
+            try:
+                plan = _parse_plan(response)
+            except ValueError:
+                scores.append(None)
+                continue
+            issues = validate_plan(plan, context, execution_log)
+            score = score_plan(plan, issues)
+            scores.append(score)
+            if best is None or score > best[0]:
+                best = (score, index, plan)
+
+        if best is None:
+            raise ValueError(f"No JSON could be extracted from any of {len(responses)} sampled plans:\n{responses[0]}")
+        logger.info(
+            f"[INFO] Sampled {len(responses)} plans (scores: "
+            f"{', '.join('unparsable' if s is None else f'{s:g}' for s in scores)}), picked #{best[1] + 1}."
+        )
+        return best[2]
+
+    def stream_tool_calls(
+        self,
+        context: Dict[str, Any],
+        user_request: str,
+        execution_log: Optional[List[Dict]] = None,
+        max_tokens: int = 10000,
+        temperature: float = 0.0,
+        context_token_budget: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """
+        Like ``generate_tool_calls``, but yield each tool call as soon as the
+        model has finished generating it, so callers can start executing the
+        plan while the rest is still being produced.
+
+        Every step is checked with ``validate_plan`` before it is yielded. On
+        the first invalid step streaming stops and the plan is generated (and
+        repaired) with ``generate_tool_calls`` instead; its steps after the
+        ones already yielded are yielded.
+        """
+        # The caller appends results while the plan streams; keep the prompt's history fixed
+        history = list(execution_log or [])
+        parser = PlanStreamParser()
+        emitted = []
+
+        def valid(call) -> bool:
+            if not self.repair_plans:
+                return True
+            problems = validate_plan(emitted + [call], context, history)[-1]
+            if problems:
+                logger.info(f"[INFO] Streamed step {len(emitted)} failed validation ({'; '.join(problems)}).")
+            return not problems
+
+        stream = self.client.chat_stream(
+            messages=self._build_messages(context, user_request, history, context_token_budget),
             max_tokens=max_tokens,
             temperature=temperature,
         )
+        for chunk in stream:
+            for call in parser.feed(chunk):
+                if not valid(call):
+                    stream.close()
+                    yield from self._regenerate_rest(
+                        emitted, context, user_request, history, max_tokens, temperature, context_token_budget
+                    )
+                    return
+                emitted.append(call)
+                yield call
+
+        if emitted and not parser.malformed:
+            return
 
+        # Not a clean JSON array (single object, broken element, ...): parse the full text
+        response = parser.buffer
         json_snippet = _extract_json_from_text(response)
         if not json_snippet:
+            if emitted:
+                logger.error("[ERROR] Rest of the streamed plan could not be parsed.")
+                return
             raise ValueError(f"No JSON could be extracted:\n{response}")
         plan = json.loads(json_snippet)
+        if isinstance(plan, dict):
+            plan = [plan]
 
-        if not plan:  # empty list case
-            return [{"tool": "noop", "args": {"reason": "Planner returned no actions."}}]
-        return plan
+        if not plan and not emitted:
+            yield {"tool": "noop", "args": {"reason": "Planner returned no actions."}}
+            return
+        for call in plan[len(emitted):]:
+            if not valid(call):
+                yield from self._regenerate_rest(
+                    emitted, context, user_request, history, max_tokens, temperature, context_token_budget
+                )
+                return
+            emitted.append(call)
+            yield call
+
+    def _regenerate_rest(
+        self, emitted, context, user_request, history, max_tokens, temperature, context_token_budget
+    ) -> List[Dict]:
+        """
+        Steps of a regenerated, repaired plan that follow the ``emitted`` ones.
+        The prompt is byte-identical to the streamed one, so at temperature 0
+        the plan normally starts with the steps already yielded.
+        """
+        logger.info("[INFO] Falling back to a repaired, non-streamed plan.")
+        plan = self.generate_tool_calls(
+            context, user_request, history, max_tokens, temperature, context_token_budget
+        )
+        if plan[:len(emitted)] != emitted:
+            logger.warning(
+                f"[WARN] Regenerated plan differs from the {len(emitted)} streamed steps already started; "
+                "running its remaining steps."
+            )
+        return plan[len(emitted):]
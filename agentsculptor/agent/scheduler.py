@@ -0,0 +1,170 @@
+# agent/scheduler.py
+import posixpath
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Tools that touch the whole project: everything before them must finish
+# first, and nothing after them may start until they are done
+BARRIER_TOOLS = {"run_tests", "format_code"}
+
+_PATH_MENTION = re.compile(r"[\w./-]+\.py\b")
+
+
+def _normalize(path: str) -> str:
+    path = posixpath.normpath(str(path).replace("\\", "/")).strip("/")
+    return "" if path == "." else path
+
+
+def step_paths(step: dict):
+    """
+    Project paths a plan step may read or write, or None if unknown (the step
+    is then treated as a barrier). ``""`` stands for the whole project.
+    """
+    tool = step.get("action") or step.get("tool")
+    args = step.get("args") or {}
+    if tool in BARRIER_TOOLS or "path" not in args:
+        return None
+    paths = {_normalize(args["path"])}
+    # e.g. refactor_code "move foo from a.py into b.py" also reads a.py
+    instruction = args.get("instruction")
+    if isinstance(instruction, str):
+        paths.update(_normalize(p) for p in _PATH_MENTION.findall(instruction))
+    return paths
+
+
+def _overlap(a: str, b: str) -> bool:
+    return a == b or not a or not b or b.startswith(a + "/") or a.startswith(b + "/")
+
+
+def conflicts(paths_a, paths_b) -> bool:
+    if paths_a is None or paths_b is None:
+        return True
+    return any(_overlap(a, b) for a in paths_a for b in paths_b)
+
+
+class StepScheduler:
+    """
+    Run plan steps concurrently while respecting their dependencies.
+
+    Each step depends on every earlier step whose paths overlap with its own
+    (a folder covers the files below it); steps without a path, and the
+    project-wide ``BARRIER_TOOLS``, depend on all earlier steps and block all
+    later ones. Steps are added one at a time, so a plan can be scheduled
+    while it is still being streamed. Results are reported through
+    ``on_result(step, result)`` in plan order, whatever order they finish in.
+    """
+
+    def __init__(self, dispatch, on_result, workers: int = 4):
+        self.dispatch = dispatch
+        self.on_result = on_result
+        self.workers = max(int(workers), 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        self._cond = threading.Condition()
+        self._steps = []
+        self._paths = []
+        self._results = {}
+        self._waiting = {}  # index -> unfinished indexes it depends on
+        self._emitted = 0
+        # SystemExit/KeyboardInterrupt raised by a step, re-raised in the scheduling thread
+        self._fatal = None
+
+    def _dependencies(self, paths) -> set:
+        deps = set()
+        for index in range(len(self._steps) - 1, -1, -1):
+            if index in self._results:
+                continue
+            if conflicts(paths, self._paths[index]):
+                deps.add(index)
+        return deps
+
+    def _run(self, index: int) -> None:
+        try:
+            result = self.dispatch(self._steps[index])
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                with self._cond:
+                    self._fatal = self._fatal or e
+                    self._cond.notify_all()
+                if self._executor is None:
+                    raise
+                return
+            step = self._steps[index]
+            result = {
+                "tool": step.get("action") or step.get("tool"),
+                "status": "error",
+                "args": step.get("args", {}),
+                "error": str(e),
+            }
+        with self._cond:
+            self._results[index] = result
+            ready = []
+            for other, deps in list(self._waiting.items()):
+                deps.discard(index)
+                if not deps:
+                    del self._waiting[other]
+                    ready.append(other)
+            for other in sorted(ready):
+                self._executor.submit(self._run, other)
+            self._cond.notify_all()
+
+    def _raise_fatal(self) -> None:
+        if self._fatal is not None:
+            raise self._fatal
+
+    def _emit(self) -> None:
+        # Report finished steps in plan order; called from the scheduling thread only
+        self._raise_fatal()
+        while True:
+            with self._cond:
+                if self._emitted not in self._results:
+                    return
+                index = self._emitted
+                self._emitted += 1
+            self.on_result(self._steps[index], self._results[index])
+
+    def add(self, step: dict) -> None:
+        """Schedule ``step`` after the earlier steps it depends on."""
+        self._raise_fatal()
+        paths = step_paths(step)
+        if self._executor is None:
+            self._steps.append(step)
+            self._paths.append(paths)
+            self._run(len(self._steps) - 1)
+            self._emit()
+            return
+
+        with self._cond:
+            deps = self._dependencies(paths)
+            self._steps.append(step)
+            self._paths.append(paths)
+            index = len(self._steps) - 1
+            if deps:
+                self._waiting[index] = deps
+            else:
+                self._executor.submit(self._run, index)
+        self._emit()
+
+    def join(self) -> None:
+        """
+        Wait for every scheduled step, reporting results as they become due.
+        Re-raises a ``SystemExit`` or ``KeyboardInterrupt`` raised by a step.
+        """
+        while True:
+            self._emit()
+            with self._cond:
+                if self._emitted == len(self._steps):
+                    return
+                if self._emitted not in self._results and self._fatal is None:
+                    self._cond.wait()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.join()
+        self.close()
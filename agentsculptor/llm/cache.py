@@ -0,0 +1,124 @@
+# llm/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from agentsculptor.utils.logging import setup_logging, get_logger
+
+setup_logging("DEBUG")
+logger = get_logger()
+
+
+def cache_key(endpoint: str, model: str, prompt, max_tokens: int, temperature: float) -> str:
+    """Stable hash of everything that determines an LLM response."""
+    payload = json.dumps(
+        {
+            "endpoint": endpoint,
+            "model": model,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent LLM response cache backed by SQLite.
+
+    Entries expire after ``ttl`` seconds (None keeps them forever) and the
+    least recently used ones are evicted once more than ``max_entries`` are
+    stored. Safe to share between threads and between processes.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl: float = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache configured by AGENTSCULPTOR_LLM_CACHE*, or None if disabled."""
+        path = os.environ.get("AGENTSCULPTOR_LLM_CACHE")
+        if not path:
+            return None
+        ttl = os.environ.get("AGENTSCULPTOR_LLM_CACHE_TTL")
+        return cls(
+            path,
+            max_entries=int(os.environ.get("AGENTSCULPTOR_LLM_CACHE_MAX_ENTRIES", 1000)),
+            ttl=float(ttl) if ttl else None,
+        )
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache(maxsize=None)
+def default_cache():
+    """Process-wide cache shared by all clients, configured from the environment."""
+    return ResponseCache.from_env()
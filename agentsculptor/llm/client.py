@@ -1,4 +1,10 @@
+import asyncio
+import json
+import os
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from agentsculptor.llm.cache import cache_key, default_cache
 from agentsculptor.utils.logging import setup_logging, get_logger
 
 setup_logging("DEBUG")
@@ -6,31 +12,49 @@ logger = get_logger()
 
 
 class VLLMClient:
-    def __init__(self, base_url="http://localhost:8008", model="openai/gpt-oss-120b"):
+    def __init__(
+        self,
+        base_url="http://localhost:8008",
+        model="openai/gpt-oss-120b",
+        pool_size=None,
+        connect_timeout=None,
+        read_timeout=None,
+        cache=None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.model = model
+        # Response cache: an explicit ResponseCache, False to disable, or the env-configured default
+        if cache is None:
+            cache = default_cache()
+        self.cache = cache or None
+        # Read from environment if not explicitly passed
+        pool_size = pool_size or int(os.environ.get("VLLM_POOL_SIZE", 10))
+        self.timeout = (
+            connect_timeout or float(os.environ.get("VLLM_CONNECT_TIMEOUT", 10)),
+            read_timeout or float(os.environ.get("VLLM_READ_TIMEOUT", 100)),
+        )
 
-    def chat(self, messages, max_tokens=512, temperature=0):
-        url = f"{self.base_url}/v1/chat/completions"
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
-        headers = {"Content-Type": "application/json"}
+        # One keep-alive session per client so repeated calls reuse TCP/TLS connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
 
-        logger.debug(f"[DEBUG] Sending chat request to: {url}")
+    def close(self):
+        self.session.close()
 
-        try:
-            response = requests.post(url, json=payload, headers=headers, timeout=100)
-            response.raise_for_status()
-            data = response.json()
+    def __enter__(self):
+        return self
 
-            if not data.get("choices") or not data["choices"][0].get("message"):
-                raise ValueError("Unexpected response format from vLLM.")
+    def __exit__(self, *exc):
+        self.close()
 
-            return data["choices"][0]["message"]["content"]
+    def _post(self, url, payload, timeout=None):
+        try:
+            response = self.session.post(url, json=payload, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            return response.json()
 
         except requests.exceptions.ConnectionError:
             raise RuntimeError(
@@ -44,28 +68,123 @@ class VLLMClient:
         except Exception as e:
             raise RuntimeError(f"Unexpected error while calling vLLM: {e}")
 
-    def complete(self, prompt, max_tokens=1024, temperature=0):
-        url = f"{self.base_url}/v1/completions"
+    def _cached(self, endpoint, prompt, max_tokens, temperature, use_cache, call):
+        if not self.cache or not use_cache:
+            return call()
+        key = cache_key(endpoint, self.model, prompt, max_tokens, temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.debug(f"[DEBUG] LLM cache hit ({endpoint}), stats: {self.cache.stats()}")
+            return cached
+        result = call()
+        self.cache.put(key, result)
+        return result
+
+    def chat(self, messages, max_tokens=512, temperature=0, timeout=None, use_cache=True):
+        """
+        Send a chat completion request.
+
+        ``timeout`` overrides the client's ``(connect, read)`` timeouts for this call.
+        Responses are served from the response cache when one is configured,
+        unless ``use_cache`` is False.
+        """
+        return self._cached(
+            "chat", messages, max_tokens, temperature, use_cache,
+            lambda: self._chat(messages, max_tokens, temperature, timeout),
+        )
+
+    def _chat(self, messages, max_tokens, temperature, timeout):
+        url = f"{self.base_url}/v1/chat/completions"
         payload = {
             "model": self.model,
-            "prompt": prompt,
+            "messages": messages,
             "max_tokens": max_tokens,
             "temperature": temperature
         }
-        headers = {"Content-Type": "application/json"}
 
-        logger.debug("[DEBUG] Sending completion request to:", url)
+        logger.debug(f"[DEBUG] Sending chat request to: {url}")
 
-        try:
-            response = requests.post(url, json=payload, headers=headers, timeout=100)
-            response.raise_for_status()
-            data = response.json()
+        data = self._post(url, payload, timeout)
+        if not data.get("choices") or not data["choices"][0].get("message"):
+            raise RuntimeError("Unexpected error while calling vLLM: Unexpected response format from vLLM.")
+
+        return data["choices"][0]["message"]["content"]
+
+    def chat_n(self, messages, n, max_tokens=512, temperature=0.7, timeout=None, use_cache=True):
+        """
+        Request ``n`` completions of the same prompt in one call (OpenAI ``n``
+        parameter), so vLLM samples them in a single batch sharing the prefill.
+
+        The cache key includes ``n``, so a batch is never served from (or
+        mistaken for) a single cached response.
+        """
+        cached = self._cached(
+            f"chat_n{n}", messages, max_tokens, temperature, use_cache,
+            lambda: json.dumps(self._chat_n(messages, n, max_tokens, temperature, timeout)),
+        )
+        return json.loads(cached)
+
+    def _chat_n(self, messages, n, max_tokens, temperature, timeout):
+        url = f"{self.base_url}/v1/chat/completions"
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "n": n,
+        }
+
+        logger.debug(f"[DEBUG] Sending chat request for {n} samples to: {url}")
+
+        data = self._post(url, payload, timeout)
+        choices = sorted(data.get("choices") or [], key=lambda choice: choice.get("index", 0))
+        if not choices or any(not choice.get("message") for choice in choices):
+            raise RuntimeError("Unexpected error while calling vLLM: Unexpected response format from vLLM.")
+
+        return [choice["message"]["content"] for choice in choices]
 
-            if not data.get("choices") or not data["choices"][0].get("text"):
-                raise ValueError("Unexpected response format from vLLM.")
+    def chat_stream(self, messages, max_tokens=512, temperature=0, timeout=None, use_cache=True):
+        """
+        Stream a chat completion, yielding content deltas as vLLM produces them (SSE).
 
-            return data["choices"][0]["text"]
+        A cached response is yielded as a single chunk; a completed stream is
+        added to the response cache like a regular ``chat`` call.
+        """
+        key = None
+        if self.cache and use_cache:
+            key = cache_key("chat", self.model, messages, max_tokens, temperature)
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.debug(f"[DEBUG] LLM cache hit (chat stream), stats: {self.cache.stats()}")
+                yield cached
+                return
 
+        url = f"{self.base_url}/v1/chat/completions"
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True,
+        }
+
+        logger.debug(f"[DEBUG] Sending streaming chat request to: {url}")
+
+        parts = []
+        try:
+            with self.session.post(url, json=payload, timeout=timeout or self.timeout, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or []
+                    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
         except requests.exceptions.ConnectionError:
             raise RuntimeError(
                 f"Could not connect to vLLM server at {self.base_url}. "
@@ -75,8 +194,91 @@ class VLLMClient:
             raise RuntimeError("Request to vLLM timed out. Check server and connectivity.")
         except requests.exceptions.HTTPError as e:
             raise RuntimeError(f"HTTP error from vLLM: {e}. Response text: {getattr(e.response, 'text', 'N/A')}")
-        except Exception as e:
-            raise RuntimeError(f"Unexpected error while calling vLLM: {e}")
+        except ValueError as e:
+            raise RuntimeError(f"Unexpected error while calling vLLM: malformed stream event: {e}")
+
+        if key is not None and parts:
+            self.cache.put(key, "".join(parts))
+
+    def complete(self, prompt, max_tokens=1024, temperature=0, timeout=None, use_cache=True):
+        """
+        Send a legacy completion request.
+
+        ``timeout`` overrides the client's ``(connect, read)`` timeouts for this call.
+        Responses are served from the response cache when one is configured,
+        unless ``use_cache`` is False.
+        """
+        return self._cached(
+            "complete", prompt, max_tokens, temperature, use_cache,
+            lambda: self._complete(prompt, max_tokens, temperature, timeout),
+        )
+
+    def _complete(self, prompt, max_tokens, temperature, timeout):
+        url = f"{self.base_url}/v1/completions"
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+
+        logger.debug(f"[DEBUG] Sending completion request to: {url}")
+
+        data = self._post(url, payload, timeout)
+        if not data.get("choices") or not data["choices"][0].get("text"):
+            raise RuntimeError("Unexpected error while calling vLLM: Unexpected response format from vLLM.")
+
+        return data["choices"][0]["text"]
+
+
+class AsyncVLLMClient:
+    """
+    asyncio front-end for VLLMClient.
+
+    Requests run in worker threads over the wrapped client's pooled session,
+    with at most ``max_concurrency`` in flight so vLLM can batch them without
+    being flooded. The limit is a thread semaphore taken in the worker thread,
+    so it holds across all event loops sharing the client (e.g. one
+    ``asyncio.run`` per scheduler thread).
+    """
+
+    def __init__(self, base_url="http://localhost:8008", model="openai/gpt-oss-120b",
+                 max_concurrency=None, client=None, **client_kwargs):
+        self.max_concurrency = max_concurrency or int(os.environ.get("VLLM_MAX_CONCURRENCY", 8))
+        if client is None:
+            client_kwargs.setdefault("pool_size", self.max_concurrency)
+            client = VLLMClient(base_url=base_url, model=model, **client_kwargs)
+        self.client = client
+        self.base_url = client.base_url
+        self.model = client.model
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+
+    def _limited(self, func, *args, **kwargs):
+        # Runs in the worker thread; asyncio primitives would bind to a single event loop
+        with self._semaphore:
+            return func(*args, **kwargs)
+
+    async def chat(self, messages, max_tokens=512, temperature=0, timeout=None, use_cache=True):
+        return await asyncio.to_thread(
+            self._limited, self.client.chat, messages, max_tokens=max_tokens, temperature=temperature,
+            timeout=timeout, use_cache=use_cache,
+        )
+
+    async def complete(self, prompt, max_tokens=1024, temperature=0, timeout=None, use_cache=True):
+        return await asyncio.to_thread(
+            self._limited, self.client.complete, prompt, max_tokens=max_tokens, temperature=temperature,
+            timeout=timeout, use_cache=use_cache,
+        )
+
+    async def chat_many(self, batch, max_tokens=512, temperature=0, timeout=None):
+        """Send several message lists concurrently; results keep the input order."""
+        return await asyncio.gather(*(
+            self.chat(messages, max_tokens=max_tokens, temperature=temperature, timeout=timeout)
+            for messages in batch
+        ))
+
+    def close(self):
+        self.client.close()
 
 
 # Example usage with error handling
@@ -89,10 +291,10 @@ if __name__ == "__main__":
         ])
         print("Chat response:", output)
     except RuntimeError as e:
-        logger.fatal("Chat failed:", e)
+        logger.fatal(f"Chat failed: {e}")
 
     try:
         legacy_output = client.complete("The capital of France is")
         print("Completion response:", legacy_output)
     except RuntimeError as e:
-        logger.fatal("Completion failed:", e)
+        logger.fatal(f"Completion failed: {e}")
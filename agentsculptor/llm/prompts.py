@@ -1,6 +1,8 @@
 # llm/prompts.py
 
+from functools import lru_cache
 from agentsculptor.tools.registry import TOOL_REGISTRY, TOOL_SIGNATURES
+from agentsculptor.tools.edit_blocks import SEARCH_MARKER, DIVIDER_MARKER, REPLACE_MARKER
 
 
 def format_tool_list(tool_registry):
@@ -10,9 +12,25 @@ def format_tool_list(tool_registry):
     )
 
 
-def planner_system_prompt() -> str:
-    """Return the system prompt for the PlannerAgent."""
-    tool_list = format_tool_list(TOOL_REGISTRY)
+# Tools left out of the planner prompt when writes are staged in a run workspace
+STAGED_HIDDEN_TOOLS = {"backup_file"}
+
+
+@lru_cache(maxsize=None)
+def planner_system_prompt(transactional: bool = False) -> str:
+    """
+    Return the system prompt for the PlannerAgent (built once, byte-identical on every call).
+
+    With ``transactional`` the tools write to a workspace that is rolled back
+    on failure, so backups are neither offered nor asked for.
+    """
+    hidden = STAGED_HIDDEN_TOOLS if transactional else set()
+    tool_list = format_tool_list([tool for tool in TOOL_REGISTRY if tool["name"] not in hidden])
+    signatures = {name: args for name, args in TOOL_SIGNATURES.items() if name not in hidden}
+    safety = (
+        "test it before modifying it (changes are staged and rolled back automatically; do not back files up)! \n"
+        if transactional else "test it and back it up before modifying it! \n"
+    )
     return (
                 "You are a software agent that plans and invokes tools to modify codebases.\n"
                 "Your job is to return a JSON array of tool calls. Each call must include:\n"
@@ -29,12 +47,44 @@ def planner_system_prompt() -> str:
                 "4. When importing between files in the same folder, use direct imports like 'from cli import main'.\n"
                 "   Do not use relative imports (e.g., 'from .cli import main') or package-style imports (e.g., 'from app.cli import main').\n"
                 "   Assume the code will be run as a script from within the folder, not as a package.\n"
-                f"5. Use the exact argument names expected by each tool. Here are the expected argument names for each tool: {TOOL_SIGNATURES}. Please match them exactly.\n"
+                f"5. Use the exact argument names expected by each tool. Here are the expected argument names for each tool: {signatures}. Please match them exactly.\n"
                 "6. Crutial: \n"
-                    "- If the file was provided in the original context, always first create a testing code in the same folder as te file to test (also here holds Do not use relative imports (e.g., 'from .cli import main') or package-style imports (e.g., 'from app.cli import main'), test it and back it up before modifying it! \n"
+                    "- If the file was provided in the original context, always first create a testing code in the same folder as te file to test (also here holds Do not use relative imports (e.g., 'from .cli import main') or package-style imports (e.g., 'from app.cli import main'), "
+                    f"{safety}"
                     "- If the file was provided in the original context, run the test if provided. If not you can use actions from the tool registry to create a testing code in the same folder as the file to test. Choose a name prefixed by the name the file you want to write the test for."
             )
-    
+
+
+def build_plan_repair_messages(planner_messages: list[dict], invalid_steps: list[str]) -> list[dict]:
+    """
+    Follow-up to a planning request asking to fix only the steps that failed
+    validation. The original prompt is kept verbatim as a prefix, so vLLM can
+    reuse its prefix cache and only the repair section is new.
+    """
+    system_message, user_message = planner_messages
+    repair_section = (
+        "\nPLAN REPAIR:\n"
+        "These steps of your plan failed validation (one JSON object per line: step, call, problems):\n"
+        + "\n".join(invalid_steps)
+        + "\n\nReturn ONLY a JSON array with exactly one corrected tool call per listed step, in the same order.\n"
+        "Fix only the listed problems. Use a noop with a reason for a step that should be dropped."
+    )
+    return [
+        system_message,
+        {"role": "user", "content": user_message["content"] + repair_section},
+    ]
+
+
+def _source_sections(original_parts: list[str], current_parts: list[str]) -> str:
+    """Original and current sources; identical copies are only sent once."""
+    if original_parts == current_parts:
+        return f"Current versions:\n```python\n{'\n\n'.join(current_parts)}\n```\n\n"
+    return (
+        f"Original versions:\n```python\n{'\n\n'.join(original_parts)}\n```\n\n"
+        f"Current versions:\n```python\n{'\n\n'.join(current_parts)}\n```\n\n"
+    )
+
+
 def refactor_system_prompt() -> str:
     """System prompt for the refactoring tool."""
     return (
@@ -57,8 +107,7 @@ def build_refactor_messages(original_parts: list[str], current_parts: list[str],
         {
             "role": "user",
             "content": (
-                f"Original versions:\n```python\n{'\n\n'.join(original_parts)}\n```\n\n"
-                f"Current versions:\n```python\n{'\n\n'.join(current_parts)}\n```\n\n"
+                f"{_source_sections(original_parts, current_parts)}"
                 f"Refactoring instruction:\n{instruction}\n\n"
                 "Updated code:"
             ),
@@ -66,6 +115,77 @@ def build_refactor_messages(original_parts: list[str], current_parts: list[str],
     ]
 
 
+def refactor_edit_system_prompt() -> str:
+    """System prompt for the refactoring tool when it asks for edit blocks."""
+    return (
+        "You are a code refactoring assistant.\n"
+        "Given the original and current source code and a refactoring instruction, "
+        "return ONLY the changes to the target file as SEARCH/REPLACE edit blocks:\n"
+        f"{SEARCH_MARKER}\n"
+        "<exact lines copied from the current target file>\n"
+        f"{DIVIDER_MARKER}\n"
+        "<lines that replace them>\n"
+        f"{REPLACE_MARKER}\n"
+        "Rules:\n"
+        "- Copy the SEARCH lines exactly, including indentation, and include enough lines to be unique.\n"
+        "- Use one block per separate change; list blocks in file order and do not overlap them.\n"
+        "- To delete code, leave the REPLACE part empty. Never repeat unchanged parts of the file.\n"
+        "- Do not modify unrelated code.\n"
+        "- Preserve style and formatting.\n"
+        "- Return ONLY edit blocks — no explanations or markdown."
+    )
+
+
+def build_refactor_edit_messages(
+    original_parts: list[str], current_parts: list[str], instruction: str, target: str
+) -> list[dict]:
+    """Construct the messages payload for an edit-block refactor request."""
+    return [
+        {"role": "system", "content": refactor_edit_system_prompt()},
+        {
+            "role": "user",
+            "content": (
+                f"{_source_sections(original_parts, current_parts)}"
+                f"Refactoring instruction:\n{instruction}\n\n"
+                f"Target file: {target}\n\n"
+                "Edit blocks:"
+            ),
+        },
+    ]
+
+
+def refactor_region_system_prompt() -> str:
+    """System prompt for refactoring a single top-level definition of a large file."""
+    return (
+        "You are a code refactoring assistant.\n"
+        "You are given the header (docstring, imports, constants) of a Python module, "
+        "ONE top-level definition from it and a refactoring instruction.\n"
+        "Return ONLY the updated version of that definition.\n"
+        "Rules:\n"
+        "- Apply only the part of the instruction that concerns this definition.\n"
+        "- If the definition needs new imports, put them at the very top of your answer.\n"
+        "- Do not repeat the header or add other definitions unless the instruction asks for it.\n"
+        "- Preserve style and formatting.\n"
+        "- Return ONLY valid code — no explanations or markdown."
+    )
+
+
+def build_refactor_region_messages(header: str, region: str, instruction: str, target: str) -> list[dict]:
+    """Construct the messages payload for refactoring one region of a file."""
+    return [
+        {"role": "system", "content": refactor_region_system_prompt()},
+        {
+            "role": "user",
+            "content": (
+                f"Module header of {target} (read-only):\n```python\n{header}\n```\n\n"
+                f"Definition to refactor:\n```python\n{region}\n```\n\n"
+                f"Refactoring instruction:\n{instruction}\n\n"
+                "Updated definition:"
+            ),
+        },
+    ]
+
+
 def import_system_prompt() -> str:
     """System prompt for the import refactoring tool."""
     return (
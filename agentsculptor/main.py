@@ -1,23 +1,92 @@
 from agentsculptor.agent.planner import PlannerAgent
 from agentsculptor.agent.loop import AgentLoop
 from agentsculptor.tools.prepare_context import prepare_context
-import sys
+from agentsculptor.utils.ignore import IgnoreRules, DEFAULT_MAX_FILE_SIZE
+from agentsculptor.llm.cache import default_cache
+import argparse
 from agentsculptor.utils.logging import setup_logging, get_logger
 
 setup_logging("DEBUG")
 logger = get_logger()
 
 
-def cli_agent(project_path, user_request):
-    context = prepare_context(project_path)
-    planner = PlannerAgent()
-    loop = AgentLoop(planner, context, user_request, project_path)  # ✅ Pass project_path here
+def cli_agent(project_path, user_request, use_cache=True, clear_cache=False, workers=None,
+              stream_plan=False, step_workers=None, test_workers=None, warm_tests=None,
+              plan_samples=None, workspace=None, **scan_options):
+    # The same rules decide what the initial scan and the in-run context refreshes include
+    ignore_rules = IgnoreRules(project_path, **scan_options)
+    context = prepare_context(
+        project_path,
+        use_cache=use_cache,
+        clear_cache=clear_cache,
+        workers=workers,
+        ignore_rules=ignore_rules,
+    )
+    planner = PlannerAgent(plan_samples=plan_samples, transactional=workspace)
+    loop = AgentLoop(planner, context, user_request, project_path, stream_plan=stream_plan,
+                     step_workers=step_workers, test_workers=test_workers,
+                     warm_tests=warm_tests, workspace=workspace, ignore_rules=ignore_rules)  # ✅ Pass project_path here
     loop.run()
 
+    cache = default_cache()
+    if cache is not None:
+        stats = cache.stats()
+        logger.info(f"[INFO] LLM response cache: {stats['hits']} hits, {stats['misses']} misses, "
+                    f"{stats['evictions']} evictions.")
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="agentsculptor-cli",
+        usage="agentsculptor-cli <project_path> '<user_request>' [options]",
+    )
+    parser.add_argument("project_path")
+    parser.add_argument("user_request")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the on-disk project context cache.")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Invalidate the project context cache before scanning.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes used to analyze files when scanning (0 = all cores).")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="Gitignore-style pattern to skip when scanning (repeatable).")
+    parser.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                        help="Only scan files matching this gitignore-style pattern (repeatable).")
+    parser.add_argument("--no-gitignore", action="store_true",
+                        help="Do not honour .gitignore files when scanning.")
+    parser.add_argument("--max-file-size", type=int, default=DEFAULT_MAX_FILE_SIZE, metavar="BYTES",
+                        help="Skip files larger than this when scanning (0 = no limit).")
+    parser.add_argument("--stream-plan", action="store_true",
+                        help="Stream the planner's response and start executing tool calls as they arrive.")
+    parser.add_argument("--step-workers", type=int, default=None,
+                        help="Plan steps on independent paths run concurrently (1 = sequential, default 4).")
+    parser.add_argument("--plan-samples", type=int, default=None, metavar="N",
+                        help="Sample N plans per iteration and keep the best-validated one (default 1).")
+    parser.add_argument("--test-workers", type=int, default=None,
+                        help="Split test runs across this many concurrent pytest processes (default 1).")
+    parser.add_argument("--warm-tests", action="store_true", default=None,
+                        help="Keep pytest workers alive between iterations to skip start-up and imports.")
+    parser.add_argument("--no-workspace", action="store_true",
+                        help="Write tool changes straight into the project instead of a run workspace.")
+    return parser
+
+
 def main():  # <-- wrapper for console_scripts
-    if len(sys.argv) < 3:
-        logger.info("[INFO]: agentsculptor-cli <project_path> '<user_request>'")
-        sys.exit(1)
-    project_path = sys.argv[1]
-    user_request = sys.argv[2]
-    cli_agent(project_path, user_request)
+    args = build_arg_parser().parse_args()
+    cli_agent(
+        args.project_path,
+        args.user_request,
+        use_cache=not args.no_cache,
+        clear_cache=args.clear_cache,
+        workers=args.workers,
+        stream_plan=args.stream_plan,
+        step_workers=args.step_workers,
+        test_workers=args.test_workers,
+        plan_samples=args.plan_samples,
+        warm_tests=args.warm_tests,
+        workspace=False if args.no_workspace else None,
+        exclude=args.exclude,
+        include=args.include or None,
+        use_gitignore=not args.no_gitignore,
+        max_file_size=args.max_file_size or None,
+    )
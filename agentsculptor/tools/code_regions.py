@@ -0,0 +1,102 @@
+# tools/code_regions.py
+import ast
+import re
+
+_IMPORT_LINE = re.compile(r"^(?:import\s+\S|from\s+\S+\s+import\s)")
+# Instructions that change how a definition is used, so its callers must change too
+_INTERFACE_CHANGE = re.compile(
+    r"\b(?:renam\w*|signatures?|parameters?|params?|arguments?|args|kwargs|return\s+types?)\b", re.IGNORECASE
+)
+
+
+def split_regions(source: str, analysis: dict) -> tuple:
+    """
+    Split a module into its header and top-level definition regions using
+    ``analyze_file`` line ranges.
+
+    Returns ``(header, regions)``: ``header`` is the text before the first
+    definition (docstring, imports, constants) and each region is a dict with
+    ``name``, ``start`` and ``end`` (0-based, end exclusive line indexes,
+    decorators included).
+    """
+    lines = source.splitlines(keepends=True)
+    regions = [
+        {"name": entry["name"], "start": entry["start_lineno"] - 1, "end": entry["end_lineno"]}
+        for entry in analysis.get("functions", []) + analysis.get("classes", [])
+    ]
+    regions.sort(key=lambda region: region["start"])
+    first = regions[0]["start"] if regions else len(lines)
+    return "".join(lines[:first]), regions
+
+
+def select_regions(regions: list, instruction: str) -> list:
+    """Regions whose definition name is mentioned in ``instruction`` as a whole word."""
+    words = set(re.findall(r"[A-Za-z_][A-Za-z0-9_]*", instruction))
+    return [region for region in regions if region["name"] in words]
+
+
+def changes_interface(instruction: str) -> bool:
+    """
+    Whether ``instruction`` renames a definition or changes its signature.
+    Callers elsewhere in the file then need updating as well, which per-region
+    refactoring would miss.
+    """
+    return bool(_INTERFACE_CHANGE.search(instruction))
+
+
+def region_text(source: str, region: dict) -> str:
+    lines = source.splitlines(keepends=True)
+    return "".join(lines[region["start"]:region["end"]])
+
+
+def split_new_imports(code: str, header: str) -> tuple:
+    """
+    Separate leading import lines of a refactored region that the module
+    header does not already contain. Returns ``(imports, code)``.
+    """
+    lines = code.splitlines(keepends=True)
+    existing = {line.strip() for line in header.splitlines()}
+    imports = []
+    body_start = 0
+    for i, line in enumerate(lines):
+        if _IMPORT_LINE.match(line):
+            if line.strip() not in existing:
+                imports.append(line.rstrip("\n") + "\n")
+            body_start = i + 1
+        elif line.strip():
+            break
+    return imports, "".join(lines[body_start:]).lstrip("\n")
+
+
+def _import_insert_index(header_lines: list) -> int:
+    # After the last top-level import of the header, or at its end
+    last = None
+    for i, line in enumerate(header_lines):
+        if _IMPORT_LINE.match(line):
+            last = i
+    return len(header_lines) if last is None else last + 1
+
+
+def splice_regions(source: str, replacements: dict, new_imports=()) -> str:
+    """
+    Replace regions in ``source``. ``replacements`` maps ``(start, end)``
+    line ranges to their new text; ``new_imports`` are added to the header.
+    The result must still parse; ``SyntaxError`` is propagated otherwise.
+    """
+    lines = source.splitlines(keepends=True)
+    for (start, end), code in sorted(replacements.items(), reverse=True):
+        if code and not code.endswith("\n"):
+            code += "\n"
+        lines[start:end] = code.splitlines(keepends=True)
+
+    imports = []
+    for line in new_imports:
+        if line not in imports:
+            imports.append(line)
+    if imports:
+        index = _import_insert_index(lines[:min((s for s, _ in replacements), default=len(lines))])
+        lines[index:index] = imports
+
+    updated = "".join(lines)
+    ast.parse(updated)
+    return updated
@@ -1,12 +1,27 @@
 # tools/dialog.py
 import sys
+import threading
+from functools import wraps
 from agentsculptor.utils.logging import setup_logging, get_logger
 
 setup_logging("DEBUG")
 logger = get_logger()
 
+# Plan steps may run in parallel threads: keep each prompt and its answer together
+_dialog_lock = threading.RLock()
+
+
+def _exclusive(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with _dialog_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
 class DialogManager:
     @staticmethod
+    @_exclusive
     def choose_file(candidates: list, instruction: str) -> list:
         """Ask the user to pick one or more files if multiple matches found."""
         if not candidates:
@@ -32,6 +47,7 @@ class DialogManager:
             sys.exit(1)
 
     @staticmethod
+    @_exclusive
     def confirm_action(files: list, instruction: str) -> bool:
         """Ask the user to confirm before applying instruction."""
         logger.dialog("I am about to apply the following instruction:")
@@ -43,6 +59,7 @@ class DialogManager:
         return choice == "y"
     
     @staticmethod
+    @_exclusive
     def confirm_file_creation(path, instruction):
         logger.dialog(f"The instruction may require creating a new file: {path}")
         choice = input("Do you allow creating new files? (y/n): ").strip().lower()
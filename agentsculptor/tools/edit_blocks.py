@@ -0,0 +1,152 @@
+# tools/edit_blocks.py
+import ast
+import re
+
+SEARCH_MARKER = "<<<<<<< SEARCH"
+DIVIDER_MARKER = "======="
+REPLACE_MARKER = ">>>>>>> REPLACE"
+
+_BLOCK_PATTERN = re.compile(
+    r"^<{5,9} ?SEARCH[^\n]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} ?REPLACE[^\n]*$",
+    re.MULTILINE | re.DOTALL,
+)
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class EditBlockError(Exception):
+    """Raised when an edit response cannot be parsed or applied cleanly."""
+
+
+def _split_lines(text: str) -> list:
+    return text.splitlines(keepends=True)
+
+
+def parse_edit_blocks(response: str) -> list:
+    """
+    Parse SEARCH/REPLACE edit blocks::
+
+        <<<<<<< SEARCH
+        old lines
+        =======
+        new lines
+        >>>>>>> REPLACE
+
+    Returns a list of ``(search, replace)`` text pairs.
+    """
+    return [(m.group(1), m.group(2)) for m in _BLOCK_PATTERN.finditer(response)]
+
+
+def parse_unified_diff(response: str) -> list:
+    """
+    Parse the hunks of a unified diff for a single file.
+
+    Returns a list of ``(old_start, old_lines, new_lines)`` where the line
+    lists keep their line endings. File headers and fences are ignored.
+    """
+    hunks = []
+    current = None
+    for line in _split_lines(response):
+        header = _HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)), [], [])
+            hunks.append(current)
+            continue
+        if current is None or line.startswith(("--- ", "+++ ", "```")):
+            continue
+        if line.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+        tag, body = line[:1], line[1:]
+        if line.strip() == "" and tag not in ("+", "-", " "):
+            tag, body = " ", line
+        if tag == " ":
+            current[1].append(body)
+            current[2].append(body)
+        elif tag == "-":
+            current[1].append(body)
+        elif tag == "+":
+            current[2].append(body)
+        else:
+            current = None
+    return hunks
+
+
+def _find_block(lines: list, block: list, hint: int = None) -> int:
+    """Index where ``block`` occurs in ``lines`` (exactly, then ignoring trailing whitespace)."""
+    if not block:
+        raise EditBlockError("empty search text")
+    for normalize in (lambda s: s, lambda s: s.rstrip()):
+        normalized = [normalize(line) for line in lines]
+        target = [normalize(line) for line in block]
+        matches = [
+            i for i in range(len(lines) - len(block) + 1)
+            if normalized[i] == target[0] and normalized[i:i + len(block)] == target
+        ]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            # Ambiguous: trust the position the diff claims, if it is one of them
+            if hint is not None:
+                closest = min(matches, key=lambda i: abs(i - hint))
+                if abs(closest - hint) <= 3:
+                    return closest
+            raise EditBlockError(f"search text matches {len(matches)} places:\n{''.join(block)}")
+    raise EditBlockError(f"search text not found:\n{''.join(block)}")
+
+
+def _ensure_newline(lines: list) -> list:
+    if lines and not lines[-1].endswith("\n"):
+        lines = lines[:-1] + [lines[-1] + "\n"]
+    return lines
+
+
+def _apply_replacements(source: str, replacements) -> str:
+    lines = _ensure_newline(_split_lines(source))
+    for old, new, hint in replacements:
+        old, new = _ensure_newline(old), _ensure_newline(new)
+        if not old:
+            if hint is None:
+                raise EditBlockError("edit block has an empty search text")
+            # Pure insertion hunk: "@@ -N,0 +M,k @@" inserts after line N
+            lines[hint:hint] = new
+            continue
+        start = _find_block(lines, old, hint)
+        lines[start:start + len(old)] = new
+    updated = "".join(lines)
+    if not source.endswith("\n") and updated.endswith("\n"):
+        updated = updated[:-1]
+    return updated
+
+
+def apply_edits(source: str, response: str, validate_python: bool = True) -> str:
+    """
+    Apply an LLM edit response (SEARCH/REPLACE blocks or a unified diff) to
+    ``source`` and return the updated text.
+
+    Edits are located by content rather than line numbers, so each block must
+    match exactly one place in the file. With ``validate_python`` the result
+    must still parse. Raises EditBlockError if nothing applies cleanly.
+    """
+    blocks = parse_edit_blocks(response)
+    if blocks:
+        replacements = [(_split_lines(search), _split_lines(replace), None) for search, replace in blocks]
+    else:
+        hunks = parse_unified_diff(response)
+        if not hunks:
+            raise EditBlockError("response contains no edit blocks or diff hunks")
+        # Line numbers shift as earlier hunks apply: track the running offset
+        replacements = []
+        offset = 0
+        for old_start, old, new in hunks:
+            hint = max(old_start - 1, 0) + offset if old else old_start + offset
+            replacements.append((old, new, hint))
+            offset += len(new) - len(old)
+
+    updated = _apply_replacements(source, replacements)
+
+    if validate_python:
+        try:
+            ast.parse(updated)
+        except SyntaxError as e:
+            raise EditBlockError(f"edits produced invalid code: {e}")
+    return updated
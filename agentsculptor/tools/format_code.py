@@ -0,0 +1,132 @@
+# tools/format_code.py
+import os
+import time
+from pathlib import Path
+
+import black
+
+from agentsculptor.utils.file_store import read_source, write_source
+from agentsculptor.utils.logging import setup_logging, get_logger
+
+setup_logging("DEBUG")
+logger = get_logger()
+
+FORMATTABLE_EXTENSIONS = (".py", ".pyi")
+
+try:
+    from black.cache import Cache
+except ImportError:  # black < 23.4 has no Cache class: format without a cache
+    Cache = None
+
+
+def black_mode(project_path: str) -> black.Mode:
+    """Black mode from the project's pyproject.toml ``[tool.black]`` section, if any."""
+    config = {}
+    pyproject = black.find_pyproject_toml((os.path.abspath(project_path),))
+    if pyproject:
+        try:
+            config = black.parse_pyproject_toml(pyproject)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[WARN] Ignoring unreadable black config in {pyproject}: {e}")
+
+    return black.Mode(
+        target_versions={black.TargetVersion[v.upper()] for v in config.get("target_version", [])},
+        line_length=config.get("line_length", black.DEFAULT_LINE_LENGTH),
+        string_normalization=not config.get("skip_string_normalization", False),
+        magic_trailing_comma=not config.get("skip_magic_trailing_comma", False),
+        preview=config.get("preview", False),
+    )
+
+
+def _expand(project_path: str, rel_paths) -> list:
+    """Formattable files among ``rel_paths``; folders stand for the files below them."""
+    files = []
+    for rel_path in rel_paths:
+        full_path = os.path.join(project_path, rel_path)
+        if os.path.isdir(full_path):
+            for root, dirs, names in os.walk(full_path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__pycache__")
+                files.extend(
+                    os.path.relpath(os.path.join(root, name), project_path)
+                    for name in sorted(names) if name.endswith(FORMATTABLE_EXTENSIONS)
+                )
+        elif rel_path.endswith(FORMATTABLE_EXTENSIONS) and os.path.isfile(full_path):
+            files.append(os.path.normpath(rel_path))
+    return list(dict.fromkeys(files))
+
+
+def _in_scope(rel_path: str, scope: str) -> bool:
+    scope = os.path.normpath(scope).strip(os.sep)
+    return scope in ("", ".") or rel_path == scope or rel_path.startswith(scope + os.sep)
+
+
+def _format_file(source: Path, mode: black.Mode, store=None) -> bool:
+    """
+    Format one file; True if it changed. The result replaces the file rather
+    than being written through it, so workspace links are never followed.
+    """
+    content = read_source(str(source), store)
+    try:
+        formatted = black.format_file_contents(content, fast=False, mode=mode)
+    except black.NothingChanged:
+        return False
+    write_source(str(source), formatted, store)
+    return True
+
+
+def format_code(project_path: str, path: str = None, changed_files=None, store=None) -> dict:
+    """
+    Format the files modified in this run with black, in-process.
+
+    Only ``changed_files`` (optionally narrowed to those under ``path``) are
+    formatted, using the project's black configuration. Black's cache skips
+    files already formatted with the same settings. Files are read and
+    written through ``store`` (a ``FileStore``) when given.
+
+    Returns the formatted, unchanged, cached and failed files and the duration.
+    """
+    started = time.perf_counter()
+    files = _expand(project_path, changed_files or [])
+    if path:
+        files = [f for f in files if _in_scope(f, path)]
+
+    summary = {"formatted": [], "unchanged": 0, "cached": 0, "failed": {}}
+    if not files:
+        logger.info("[INFO] No modified Python files to format.")
+        summary["duration_s"] = 0.0
+        return summary
+
+    mode = black_mode(project_path)
+    sources = {Path(os.path.abspath(os.path.join(project_path, f))): f for f in files}
+    cache = Cache.read(mode) if Cache is not None else None
+    todo = set(sources)
+    if cache is not None:
+        todo, done = cache.filtered_cached(sources)
+        summary["cached"] = len(done)
+
+    formatted_ok = []
+    for source in sorted(todo):
+        rel_path = sources[source]
+        try:
+            changed = _format_file(source, mode, store)
+        except Exception as e:  # black raises plain exceptions for unparsable code
+            summary["failed"][rel_path] = str(e)
+            logger.error(f"[ERROR] Could not format {rel_path}: {e}")
+            continue
+        formatted_ok.append(source)
+        if changed:
+            summary["formatted"].append(rel_path)
+        else:
+            summary["unchanged"] += 1
+
+    if cache is not None and formatted_ok:
+        cache.write(formatted_ok)
+
+    summary["duration_s"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"[INFO] Formatted {len(summary['formatted'])} of {len(files)} modified files "
+        f"({summary['cached']} cached, {len(summary['failed'])} failed) in {summary['duration_s']:.2f}s."
+    )
+    if summary["failed"]:
+        raise RuntimeError(f"black failed on: {', '.join(summary['failed'])}")
+    return summary
@@ -0,0 +1,249 @@
+# tools/import_rewriter.py
+import ast
+import re
+
+IDENTIFIER = r"[A-Za-z_][A-Za-z0-9_]*"
+DOTTED = rf"{IDENTIFIER}(?:\.{IDENTIFIER})*"
+# A module written as a dotted name or as a path ("pkg/mod.py")
+MODULE_NAME = rf"(?:{IDENTIFIER}/)*{IDENTIFIER}(?:\.py)?|{DOTTED}"
+
+
+def _module_ref(group: str) -> str:
+    return rf"[`'\"]?(?P<{group}>{MODULE_NAME})[`'\"]?"
+
+
+_CLAUSE_PATTERNS = [
+    re.compile(
+        rf"(?:rename|move|replace|change|update)\s+(?:the\s+)?(?P<imports>imports?\s+(?:of|from)\s+)?"
+        rf"(?P<old_kw>(?:module|package)\s+)?{_module_ref('old')}\s+(?:to|with|into|->|=>)\s+"
+        rf"(?:the\s+)?(?P<new_kw>(?:module|package)\s+)?{_module_ref('new')}",
+        re.IGNORECASE,
+    ),
+    re.compile(rf"{_module_ref('old')}\s*(?:->|=>)\s*{_module_ref('new')}"),
+]
+
+
+class UnsupportedImport(Exception):
+    """Raised when a file's imports cannot be rewritten safely without the LLM."""
+
+
+def _to_module(ref: str) -> str:
+    if ref.endswith(".py"):
+        ref = ref[:-3]
+    ref = ref.replace("/", ".")
+    if ref.endswith(".__init__"):
+        ref = ref[: -len(".__init__")]
+    return ref
+
+
+def _is_module_like(ref: str) -> bool:
+    return "." in ref or "/" in ref
+
+
+def _names_modules(match) -> bool:
+    """
+    Whether a clause clearly talks about modules: both operands are dotted
+    names or paths, or a "module"/"package"/"imports of" keyword says so.
+    Bare words ("change print to logging") are left to the LLM.
+    """
+    groups = match.groupdict()
+    if groups.get("imports") or groups.get("old_kw") or groups.get("new_kw"):
+        return True
+    if "old_kw" not in groups:  # "a -> b" is explicit rename notation
+        return True
+    return _is_module_like(groups["old"]) and _is_module_like(groups["new"])
+
+
+def parse_rename_instruction(instruction: str):
+    """
+    Parse mechanical rename instructions such as ``rename module a.b to a.c``,
+    ``move utils.py to pkg/utils.py`` or ``a.b -> a.c; x -> y``.
+
+    Returns a list of ``(old, new)`` module pairs, or None if any clause is not
+    a plain rename, in which case the caller should fall back to the LLM.
+    """
+    if not instruction:
+        return None
+    clauses = [c.strip(" .") for c in re.split(r"[;\n]|,\s*and\s+|\s+and\s+|,", instruction) if c.strip(" .")]
+    renames = []
+    for clause in clauses:
+        for pattern in _CLAUSE_PATTERNS:
+            match = pattern.fullmatch(clause)
+            if match:
+                if not _names_modules(match):
+                    return None
+                old, new = _to_module(match.group("old")), _to_module(match.group("new"))
+                if old != new:
+                    renames.append((old, new))
+                break
+        else:
+            return None
+    return renames or None
+
+
+def _match(name: str, renames):
+    for old, new in renames:
+        if name == old or name.startswith(old + "."):
+            return new + name[len(old):]
+    return None
+
+
+class _Source:
+    """Maps ast (line, utf-8 byte column) positions to string offsets."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines = text.splitlines(keepends=True)
+        self.starts = [0]
+        for line in self.lines:
+            self.starts.append(self.starts[-1] + len(line))
+
+    def offset(self, lineno: int, col: int) -> int:
+        line = self.lines[lineno - 1] if lineno - 1 < len(self.lines) else ""
+        return self.starts[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    def span(self, node):
+        return (
+            self.offset(node.lineno, node.col_offset),
+            self.offset(node.end_lineno, node.end_col_offset),
+        )
+
+
+def _dotted(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return ".".join(reversed(parts))
+    return None
+
+
+def _format_alias(name: str, asname):
+    return f"{name} as {asname}" if asname and asname != name else name
+
+
+def rewrite_imports(source: str, renames):
+    """
+    Rewrite import statements in ``source`` according to ``renames``.
+
+    Only the affected import statements (and, for plain ``import a.b``, the
+    ``a.b.x`` attribute chains that use them) are edited; all other text is
+    left byte-for-byte intact. Returns ``(new_source, changed)``.
+
+    Raises UnsupportedImport for cases that cannot be rewritten mechanically,
+    such as relative imports of a renamed module or unparsable source.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        raise UnsupportedImport(f"cannot parse source: {e}")
+
+    src = _Source(source)
+    edits = []
+    usage_prefixes = []
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                new_name = _match(alias.name, renames)
+                if new_name is None:
+                    continue
+                start, end = src.span(alias)
+                if alias.asname:
+                    replacement = _format_alias(new_name, alias.asname)
+                elif "." not in alias.name:
+                    # ``import a`` binds ``a``; keep the binding instead of chasing usages
+                    replacement = _format_alias(new_name, alias.name)
+                else:
+                    replacement = new_name
+                    usage_prefixes.append(alias.name)
+                edits.append((start, end, replacement))
+
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                # Where a relative import points depends on how the project is laid out
+                # on sys.path, so any one that may touch a renamed module goes to the LLM
+                segments = set((node.module or "").split(".")) | {a.name for a in node.names}
+                if any(old.rsplit(".", 1)[-1] in segments for old, _ in renames):
+                    raise UnsupportedImport(f"relative import of a renamed module on line {node.lineno}")
+                continue
+
+            new_module = _match(node.module, renames)
+            if new_module is not None:
+                start, end = src.span(node)
+                statement = source[start:end]
+                updated = re.sub(
+                    rf"^from\s+{re.escape(node.module)}(?![\w.])",
+                    f"from {new_module}",
+                    statement,
+                    count=1,
+                )
+                if updated == statement:
+                    raise UnsupportedImport(f"could not locate module name on line {node.lineno}")
+                edits.append((start, end, updated))
+                continue
+
+            moved = {}
+            for alias in node.names:
+                if alias.name == "*":
+                    continue
+                new_full = _match(f"{node.module}.{alias.name}", renames)
+                if new_full is not None:
+                    moved[id(alias)] = new_full.rsplit(".", 1) if "." in new_full else ("", new_full)
+
+            if not moved:
+                continue
+            if all(parent == node.module for parent, _ in moved.values()):
+                # Same package: rename the imported names, keeping their bindings
+                for alias in node.names:
+                    if id(alias) in moved:
+                        start, end = src.span(alias)
+                        new_name = moved[id(alias)][1]
+                        edits.append((start, end, _format_alias(new_name, alias.asname or alias.name)))
+                continue
+
+            # Moved to another package: regenerate the statement, splitting it if needed
+            kept = [alias for alias in node.names if id(alias) not in moved]
+            statements = []
+            if kept:
+                statements.append(ast.unparse(ast.ImportFrom(module=node.module, names=kept, level=0)))
+            for alias in node.names:
+                if id(alias) not in moved:
+                    continue
+                parent, new_name = moved[id(alias)]
+                binding = _format_alias(new_name, alias.asname or alias.name)
+                statements.append(f"from {parent} import {binding}" if parent else f"import {binding}")
+            start, end = src.span(node)
+            indent = " " * node.col_offset
+            edits.append((start, end, f"\n{indent}".join(statements)))
+
+    # ``import a.b`` and ``import a.b.c`` both make ``a.b.c.x`` match; only edit the outermost prefix
+    usage_prefixes = {
+        prefix for prefix in usage_prefixes
+        if not any(prefix != other and prefix.startswith(other + ".") for other in usage_prefixes)
+    }
+    if usage_prefixes:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute) and _dotted(node) in usage_prefixes:
+                start, end = src.span(node)
+                edits.append((start, end, _match(_dotted(node), renames)))
+
+    if not edits:
+        return source, False
+
+    edits.sort(key=lambda edit: edit[0], reverse=True)
+    updated = source
+    last_start = len(source) + 1
+    for start, end, replacement in edits:
+        if end > last_start:
+            raise UnsupportedImport("overlapping import edits")
+        updated = updated[:start] + replacement + updated[end:]
+        last_start = start
+
+    try:
+        ast.parse(updated)
+    except SyntaxError as e:
+        raise UnsupportedImport(f"rewrite produced invalid code: {e}")
+    return updated, updated != source
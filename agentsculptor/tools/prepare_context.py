@@ -1,78 +1,272 @@
 # tools/prepare_context.py
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from agentsculptor.utils.file_ops import analyze_file  # We'll use your existing analyzer
+from agentsculptor.utils.context_cache import ContextCache, CACHE_DIR_NAME
+from agentsculptor.utils.ignore import IgnoreRules, DEFAULT_MAX_FILE_SIZE
+from agentsculptor.utils.dependency_graph import build_dependency_graph
 from agentsculptor.utils.logging import setup_logging, get_logger
 
 setup_logging("DEBUG")
 logger = get_logger()
 
-def prepare_context(project_path: str, include_content=True, max_content_chars=10000):
+TEXT_EXTENSIONS = {".txt", ".md", ".json", ".yaml", ".yml"}
+
+
+def _has_text_content(file: str) -> bool:
+    return os.path.splitext(file)[1] in TEXT_EXTENSIONS or file.startswith("Dockerfile")
+
+
+def entry_from_source(rel_path: str, source, size_bytes: int, include_content=True,
+                      max_content_chars=10000, analysis=None):
+    """
+    Build the context entry for a file whose content is already in memory.
+
+    ``source`` is None when the file could not be read as text; ``analysis``
+    is a precomputed ``analyze_file`` result for Python files.
+    """
+    file = os.path.basename(rel_path)
+    file_info = {"size_bytes": size_bytes}
+
+    if file.endswith(".py"):
+        if analysis is None:
+            # Use the analyzer to get functions, classes, imports, etc.
+            analysis = analyze_file(rel_path, content=source) if source else {}
+
+        file_info.update({
+            "lines": analysis.get("num_lines", 0),
+            "functions": [
+                {"name": f["name"], "line": f["lineno"]}
+                for f in analysis.get("functions", [])
+            ],
+            "classes": [
+                {"name": c["name"], "line": c["lineno"]}
+                for c in analysis.get("classes", [])
+            ],
+            "imports": analysis.get("imports", [])
+        })
+
+        if include_content and source:
+            file_info["content"] = source[:max_content_chars]
+
+    else:
+        # For non-Python files, store limited text content for certain types
+        file_info["type"] = os.path.splitext(file)[1]
+        if include_content and source is not None and _has_text_content(file):
+            file_info["content"] = source[:max_content_chars]
+
+    return file_info
+
+
+def analyze_entry(file_path: str, rel_path: str, include_content=True, max_content_chars=10000):
+    """
+    Build the context entry for a single file.
+
+    Returns None if the file could not be analyzed and should be left out
+    of the context.
+    """
+    file = os.path.basename(file_path)
+    source = None
+    # Read once: the same source feeds the analysis and the stored content
+    if file.endswith(".py") or (include_content and _has_text_content(file)):
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.debug(f"[DEBUG] Could not read content of {rel_path}: {e}")
+            source = "" if file.endswith(".py") else None
+
+    try:
+        return entry_from_source(
+            rel_path, source, os.path.getsize(file_path), include_content, max_content_chars,
+            analysis=analyze_file(file_path, content=source) if file.endswith(".py") and source else None,
+        )
+    except Exception as e:
+        logger.debug(f"[DEBUG] Could not analyze {rel_path}: {e}")
+        return None
+
+
+def update_context_files(context: dict, store, rel_paths, include_content=True, max_content_chars=10000,
+                         ignore_rules=None) -> list:
+    """
+    Re-analyze the files in ``rel_paths`` from a ``FileStore`` (no disk walk,
+    usually no disk read) and replace or add their context entries in place.
+
+    ``ignore_rules`` (default: the built-in rules for the store's root) are
+    applied as in ``prepare_context``: ignored or too large files are left
+    out, and dropped if they were in the context. Files that cannot be read
+    as text are skipped. Returns the updated paths; pass them to
+    ``update_dependency_graph`` to patch the import graph.
+    """
+    rules = ignore_rules or IgnoreRules(store.root)
+    updated = []
+    files = context.setdefault("files", {})
+    for rel_path in sorted(rel_paths):
+        try:
+            excluded = rules.excludes(rel_path)
+            if not excluded:
+                source = store.read(rel_path)
+                excluded = rules.too_large(len(source.encode("utf-8")))
+            if excluded:
+                if files.pop(rel_path, None) is not None:
+                    updated.append(rel_path)
+                logger.debug(f"[DEBUG] Leaving {rel_path} out of the context: ignored or too large.")
+                continue
+            analysis = store.analyze(rel_path) if rel_path.endswith(".py") and source else None
+        except (OSError, UnicodeDecodeError) as e:
+            logger.debug(f"[DEBUG] Could not refresh {rel_path}: {e}")
+            continue
+        files[rel_path] = entry_from_source(
+            rel_path, source, len(source.encode("utf-8")), include_content, max_content_chars, analysis
+        )
+        new_folders = []
+        folder = os.path.dirname(rel_path)
+        while "folders" in context and folder not in context["folders"]:
+            new_folders.insert(0, folder)
+            folder = os.path.dirname(folder)
+        context.get("folders", []).extend(new_folders)
+        updated.append(rel_path)
+    return updated
+
+
+def _analyze_entries(items, include_content, max_content_chars, workers=None, chunk_size=64):
+    """
+    Analyze ``(file_path, rel_path)`` pairs, serially or over a process pool.
+
+    Results are returned in input order so both paths produce the same context.
+    Small batches stay in-process since pool startup would dominate.
+    """
+    analyze = partial(analyze_entry, include_content=include_content, max_content_chars=max_content_chars)
+    if not workers or workers <= 1 or len(items) <= chunk_size:
+        return [analyze(file_path, rel_path) for file_path, rel_path in items]
+
+    file_paths = [file_path for file_path, _ in items]
+    rel_paths = [rel_path for _, rel_path in items]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze, file_paths, rel_paths, chunksize=chunk_size))
+
+
+def prepare_context(
+    project_path: str,
+    include_content=True,
+    max_content_chars=10000,
+    use_cache=False,
+    clear_cache=False,
+    cache_path=None,
+    workers=None,
+    chunk_size=64,
+    exclude=None,
+    include=None,
+    use_gitignore=True,
+    max_file_size=DEFAULT_MAX_FILE_SIZE,
+    ignore_rules=None,
+):
     """
     Build a project context dictionary containing metadata for all files,
-    optionally including the actual source content.
+    optionally including the actual source content, plus the project's
+    module-level import graph (``dependency_graph``) and its reverse index
+    (``reverse_dependencies``), both keyed by relative file path.
 
     Args:
         project_path (str): Root path of the project.
         include_content (bool): Whether to include file contents.
         max_content_chars (int): Truncate file content to this many characters.
+        use_cache (bool): Reuse per-file entries from the on-disk context cache
+            and only re-analyze files whose content changed.
+        clear_cache (bool): Invalidate the context cache before walking.
+        cache_path (str): Location of the cache file. Defaults to
+            ``<project_path>/.agentsculptor/context_cache.json``.
+        workers (int): Number of processes used to analyze files. ``None`` or
+            1 analyzes serially; 0 uses all available cores.
+        chunk_size (int): Number of files sent to a worker per task.
+        exclude (list[str]): Extra gitignore-style patterns to skip, on top of
+            the built-in excludes (.git, .venv, node_modules, build, ...).
+        include (list[str]): If given, only files matching one of these
+            gitignore-style patterns are added to the context.
+        use_gitignore (bool): Honour ``.gitignore`` files found during the walk.
+        max_file_size (int): Skip files larger than this many bytes
+            (``None`` disables the cutoff).
+        ignore_rules (IgnoreRules): Prebuilt rules; overrides the four
+            options above.
     """
     context = {
         "files": {},
         "folders": []
     }
 
+    cache = None
+    if use_cache or clear_cache:
+        cache = ContextCache(
+            project_path,
+            settings={"include_content": include_content, "max_content_chars": max_content_chars},
+            cache_path=cache_path,
+        )
+        if clear_cache:
+            cache.clear()
+        if not use_cache:
+            cache = None
+
+    rules = ignore_rules or IgnoreRules(
+        project_path,
+        exclude=exclude,
+        include=include,
+        use_gitignore=use_gitignore,
+        max_file_size=max_file_size,
+    )
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    # Walk first, then analyze everything the cache could not answer
+    entries = {}
+    pending = []
     for root, dirs, files in os.walk(project_path):
         rel_root = os.path.relpath(root, project_path)
         if rel_root == ".":
             rel_root = ""
+            # Never index our own cache directory
+            dirs[:] = [d for d in dirs if d != CACHE_DIR_NAME]
+        rules.load_gitignore(rel_root)
+        rules.prune_dirs(rel_root, dirs)
+        # Fixed walk order keeps the context (and the planner's prompt prefix) stable across runs
+        dirs.sort()
         context["folders"].append(rel_root)
 
-        for file in files:
+        for file in sorted(files):
             file_path = os.path.join(root, file)
             rel_path = os.path.join(rel_root, file) if rel_root else file
-            file_info = {"size_bytes": os.path.getsize(file_path)}
-
-            if file.endswith(".py"):
-                try:
-                    # Use the analyzer to get functions, classes, imports, etc.
-                    analysis = analyze_file(file_path)
-                except Exception as e:
-                    logger.debug(f"[DEBUG] Could not analyze {rel_path}: {e}")
+            if rules.is_ignored(rel_path):
+                continue
+            try:
+                if rules.too_large(os.path.getsize(file_path)):
+                    logger.debug(f"[DEBUG] Skipping {rel_path}: larger than {rules.max_file_size} bytes.")
                     continue
+            except OSError as e:
+                logger.debug(f"[DEBUG] Could not stat {rel_path}: {e}")
+                continue
+
+            file_info = cache.get(rel_path, file_path) if cache is not None else None
+            entries[rel_path] = file_info
+            if file_info is None:
+                pending.append((file_path, rel_path))
 
-                file_info.update({
-                    "lines": analysis.get("num_lines", 0),
-                    "functions": [
-                        {"name": f["name"], "line": f["lineno"]}
-                        for f in analysis.get("functions", [])
-                    ],
-                    "classes": [
-                        {"name": c["name"], "line": c["lineno"]}
-                        for c in analysis.get("classes", [])
-                    ],
-                    "imports": analysis.get("imports", [])
-                })
-
-                if include_content:
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            source = f.read()
-                        file_info["content"] = source[:max_content_chars]
-                    except UnicodeDecodeError:
-                        logger.debug(f"[DEBUG] Could not read content of {rel_path} (non-UTF8).")
-
-            else:
-                # For non-Python files, store limited text content for certain types
-                ext = os.path.splitext(file)[1]
-                file_info["type"] = ext
-                if include_content and (ext in {".txt", ".md", ".json", ".yaml", ".yml"} or file.startswith("Dockerfile")):
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                        file_info["content"] = content[:max_content_chars]
-                    except UnicodeDecodeError:
-                        logger.debug(f"[DEBUG] Could not read content of {rel_path} (non-UTF8).")
+    results = _analyze_entries(pending, include_content, max_content_chars, workers, chunk_size)
+    for (_, rel_path), file_info in zip(pending, results):
+        entries[rel_path] = file_info
+        if cache is not None and file_info is not None:
+            cache.put(rel_path, file_info)
 
+    for rel_path, file_info in entries.items():
+        if file_info is not None:
             context["files"][rel_path] = file_info
 
+    graph, reverse = build_dependency_graph(context["files"])
+    context["dependency_graph"] = graph
+    context["reverse_dependencies"] = reverse
+
+    if cache is not None:
+        cache.save()
+        logger.info(f"[INFO] Context cache: {cache.hits} hits, {cache.misses} misses.")
+
     return context
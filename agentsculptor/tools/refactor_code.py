@@ -1,9 +1,25 @@
 # tools/refactor_code.py
+import asyncio
 import os
 import re
-from agentsculptor.llm.client import VLLMClient
-from agentsculptor.llm.prompts import build_refactor_messages
+from agentsculptor.llm.client import VLLMClient, AsyncVLLMClient
+from agentsculptor.llm.prompts import (
+    build_refactor_messages,
+    build_refactor_edit_messages,
+    build_refactor_region_messages,
+)
+from agentsculptor.tools.code_regions import (
+    changes_interface,
+    split_regions,
+    select_regions,
+    region_text,
+    split_new_imports,
+    splice_regions,
+)
 from agentsculptor.tools.dialog import DialogManager
+from agentsculptor.tools.edit_blocks import apply_edits, EditBlockError
+from agentsculptor.utils.file_ops import analyze_file
+from agentsculptor.utils.file_store import read_source, write_source
 
 from agentsculptor.utils.logging import setup_logging, get_logger
 
@@ -11,11 +27,22 @@ setup_logging("DEBUG")
 logger = get_logger()
 
 class RefactorCodeTool:
-    def __init__(self, base_url=None, model=None):
+    def __init__(self, base_url=None, model=None, edit_mode=None, max_tokens=None, chunk_lines=None, store=None):
         # Read from environment if not explicitly passed
         self.base_url = (base_url or os.environ.get("VLLM_URL", "http://localhost:8008")).rstrip("/")
         self.model = model or os.environ.get("VLLM_MODEL", "openai/gpt-oss-120b")
+        # "edits": SEARCH/REPLACE blocks for existing files, "whole": regenerate the full file
+        self.edit_mode = edit_mode or os.environ.get("AGENTSCULPTOR_REFACTOR_MODE", "edits")
+        self.max_tokens = max_tokens or int(os.environ.get("AGENTSCULPTOR_REFACTOR_MAX_TOKENS", 4096))
+        # Files longer than this are refactored per top-level definition (0 disables)
+        self.chunk_lines = (
+            chunk_lines if chunk_lines is not None
+            else int(os.environ.get("AGENTSCULPTOR_REFACTOR_CHUNK_LINES", 400))
+        )
+        # Shared FileStore of the run: files are read once and writes are visible to other tools
+        self.store = store
         self.llm_client = VLLMClient(base_url=self.base_url, model=self.model)
+        self.async_llm_client = AsyncVLLMClient(client=self.llm_client)
 
     def _clean_code_content(self, content: str) -> str:
         """Strip markdown fences (any language) and whitespace from LLM output."""
@@ -47,13 +74,11 @@ class RefactorCodeTool:
         return any(kw in instruction.lower() for kw in keywords)
 
 
-    def refactor_file(self, project_path: str, relative_path: str, instruction: str) -> None:
+    def _gather_sources(self, project_path: str, relative_path: str, instruction: str):
         """
-        Load the latest version of the file(s) from disk and send to the LLM
-        along with the refactoring instruction. Save the updated code back to disk.
+        Resolve the source files (asking the user if ambiguous) and read them.
+        Returns ``(original_parts, current_parts)``, or None if the user cancelled.
         """
-        full_path = os.path.join(project_path, relative_path)
-
         # 1. Detect candidate files
         source_files = self._detect_source_files(instruction) or [relative_path]
 
@@ -63,7 +88,7 @@ class RefactorCodeTool:
         # 3. Confirm action before proceeding
         if not DialogManager.confirm_action(source_files, instruction):
             logger.info("[INFO] Refactor cancelled by user.")
-            return
+            return None
 
         # 4. Gather original + current code from disk
         original_parts = []
@@ -71,18 +96,115 @@ class RefactorCodeTool:
         for src in source_files:
             disk_path = os.path.join(project_path, src)
             if os.path.exists(disk_path):
-                with open(disk_path, "r", encoding="utf-8") as f:
-                    code = f.read()
+                code = read_source(disk_path, self.store)
                 original_parts.append(f"# {src}\n{code}")
                 current_parts.append(f"# {src}\n{code}")
             else:
                 logger.debug(f"[DEBUG] Source file not found on disk: {src}")
+        return original_parts, current_parts
 
+    def _use_edits(self, project_path: str, relative_path: str) -> bool:
+        """Edit blocks need an existing target; new files are always generated whole."""
+        if self.edit_mode == "whole":
+            return False
+        return os.path.isfile(os.path.join(project_path, relative_path))
+
+    def _build_messages(self, relative_path: str, instruction: str, sources, use_edits: bool):
         # 5. Build LLM prompt
-        messages = build_refactor_messages(original_parts, current_parts, instruction)
+        original_parts, current_parts = sources
+        if use_edits:
+            return build_refactor_edit_messages(original_parts, current_parts, instruction, relative_path)
+        return build_refactor_messages(original_parts, current_parts, instruction)
 
-        # 6. Send to LLM
-        response = self.llm_client.chat(messages=messages, max_tokens=4096, temperature=0)
+    def _apply_edit_response(self, project_path: str, relative_path: str, response: str) -> bool:
+        """Apply edit blocks to the target file; False means whole-file mode is needed."""
+        full_path = os.path.join(project_path, relative_path)
+        source = read_source(full_path, self.store)
+        try:
+            updated = apply_edits(source, response, validate_python=relative_path.endswith(".py"))
+        except EditBlockError as e:
+            logger.warning(f"[WARN] Could not apply edits to {relative_path}, regenerating whole file: {e}")
+            return False
+
+        write_source(full_path, updated, self.store)
+        logger.info(f"[INFO] Refactored file {relative_path} according to instruction (edits).")
+        return True
+
+    def _plan_regions(self, project_path: str, relative_path: str, instruction: str, sources):
+        """
+        For large single-file refactors whose instruction targets exactly one
+        top-level definition, return that region to refactor on its own; else
+        None. Instructions spanning several definitions ("merge A into B") or
+        changing an interface need the whole file, so changes stay consistent.
+        """
+        full_path = os.path.join(project_path, relative_path)
+        if (
+            not self.chunk_lines
+            or not relative_path.endswith(".py")
+            or not os.path.isfile(full_path)
+            or len(sources[1]) != 1
+            or self._is_creation_required(instruction)
+        ):
+            return None
+        if changes_interface(instruction):
+            logger.debug(f"[DEBUG] Instruction changes an interface, refactoring whole file {relative_path}.")
+            return None
+
+        source = read_source(full_path, self.store)
+        total_lines = source.count("\n") + 1
+        if total_lines <= self.chunk_lines:
+            return None
+        analysis = self.store.analyze(full_path) if self.store is not None else analyze_file(full_path, content=source)
+        if not analysis:
+            return None
+
+        header, regions = split_regions(source, analysis)
+        selected = select_regions(regions, instruction)
+        if len(selected) != 1:
+            logger.debug(
+                f"[DEBUG] Instruction names {len(selected)} definitions of {relative_path}, refactoring whole file."
+            )
+            return None
+
+        sent = header.count("\n") + sum(r["end"] - r["start"] for r in selected)
+        logger.info(
+            f"[INFO] Refactoring {len(selected)}/{len(regions)} definitions of {relative_path} "
+            f"({sent}/{total_lines} lines sent)."
+        )
+        return {"source": source, "header": header, "regions": selected}
+
+    def _region_messages(self, relative_path: str, instruction: str, plan: dict) -> list:
+        return [
+            build_refactor_region_messages(
+                plan["header"], region_text(plan["source"], region), instruction, relative_path
+            )
+            for region in plan["regions"]
+        ]
+
+    def _apply_region_responses(self, project_path: str, relative_path: str, plan: dict, responses: list) -> bool:
+        """Splice refactored regions back; False means the whole file must be refactored."""
+        replacements = {}
+        new_imports = []
+        for region, response in zip(plan["regions"], responses):
+            imports, code = split_new_imports(self._clean_code_content(response), plan["header"])
+            if not code.strip():
+                logger.warning(f"[WARN] Empty refactor of {region['name']} in {relative_path}, refactoring whole file.")
+                return False
+            new_imports.extend(imports)
+            replacements[(region["start"], region["end"])] = code
+
+        try:
+            updated = splice_regions(plan["source"], replacements, new_imports)
+        except SyntaxError as e:
+            logger.warning(f"[WARN] Refactored regions of {relative_path} do not parse, refactoring whole file: {e}")
+            return False
+
+        write_source(os.path.join(project_path, relative_path), updated, self.store)
+        logger.info(f"[INFO] Refactored file {relative_path} according to instruction (regions).")
+        return True
+
+    def _apply_response(self, project_path: str, relative_path: str, instruction: str, response: str) -> None:
+        full_path = os.path.join(project_path, relative_path)
 
         # 7. Clean and prepare code
         cleaned_code = self._clean_code_content(response) or "# Empty file after refactor\n"
@@ -99,9 +221,69 @@ class RefactorCodeTool:
                     logger.info(f"[INFO] Skipping creation of {relative_path} (not essential).")
                     return
 
-        # 9. Write the updated file
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with open(full_path, "w", encoding="utf-8") as f:
-            f.write(cleaned_code)
+        # 9. Write the updated file (replaced, never written through a workspace link)
+        write_source(full_path, cleaned_code, self.store)
 
         logger.info(f"[INFO] Refactored file {relative_path} according to instruction.")
+
+    def refactor_file(self, project_path: str, relative_path: str, instruction: str) -> None:
+        """
+        Load the latest version of the file(s) from disk and send to the LLM
+        along with the refactoring instruction. Save the updated code back to disk.
+
+        Large files whose instruction names top-level definitions send only
+        those definitions (plus the module header), refactored in parallel
+        and spliced back. Other existing files are edited through
+        SEARCH/REPLACE blocks, so the output scales with the size of the
+        change; if the edits do not apply cleanly the whole file is
+        regenerated instead.
+        """
+        sources = self._gather_sources(project_path, relative_path, instruction)
+        if sources is None:
+            return
+
+        # 6. Send to LLM
+        plan = self._plan_regions(project_path, relative_path, instruction, sources)
+        if plan:
+            responses = asyncio.run(self.async_llm_client.chat_many(
+                self._region_messages(relative_path, instruction, plan), max_tokens=self.max_tokens, temperature=0
+            ))
+            if self._apply_region_responses(project_path, relative_path, plan, responses):
+                return
+
+        if self._use_edits(project_path, relative_path):
+            messages = self._build_messages(relative_path, instruction, sources, use_edits=True)
+            response = self.llm_client.chat(messages=messages, max_tokens=self.max_tokens, temperature=0)
+            if self._apply_edit_response(project_path, relative_path, response):
+                return
+
+        messages = self._build_messages(relative_path, instruction, sources, use_edits=False)
+        response = self.llm_client.chat(messages=messages, max_tokens=self.max_tokens, temperature=0)
+        self._apply_response(project_path, relative_path, instruction, response)
+
+    async def refactor_file_async(self, project_path: str, relative_path: str, instruction: str) -> None:
+        """
+        Async variant of ``refactor_file``: user dialogs run up front, then the
+        LLM request is awaited so several files can be in flight at once.
+        """
+        sources = self._gather_sources(project_path, relative_path, instruction)
+        if sources is None:
+            return
+
+        plan = self._plan_regions(project_path, relative_path, instruction, sources)
+        if plan:
+            responses = await self.async_llm_client.chat_many(
+                self._region_messages(relative_path, instruction, plan), max_tokens=self.max_tokens, temperature=0
+            )
+            if self._apply_region_responses(project_path, relative_path, plan, responses):
+                return
+
+        if self._use_edits(project_path, relative_path):
+            messages = self._build_messages(relative_path, instruction, sources, use_edits=True)
+            response = await self.async_llm_client.chat(messages=messages, max_tokens=self.max_tokens, temperature=0)
+            if self._apply_edit_response(project_path, relative_path, response):
+                return
+
+        messages = self._build_messages(relative_path, instruction, sources, use_edits=False)
+        response = await self.async_llm_client.chat(messages=messages, max_tokens=self.max_tokens, temperature=0)
+        self._apply_response(project_path, relative_path, instruction, response)
@@ -22,6 +22,18 @@ TOOL_REGISTRY = [
             "required": ["path", "content"]
         },
     },
+    {
+        "name": "modify_file",
+        "description": "Overwrite an existing file with complete new content",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string"},
+                "content": {"type": "string"}
+            },
+            "required": ["path", "content"]
+        },
+    },
     {
         "name": "refactor_code",
         "description": "Refactor an existing file according to instructions",
@@ -36,7 +48,11 @@ TOOL_REGISTRY = [
     },
     {
         "name": "update_imports",
-        "description": "Update imports across files to use new module paths",
+        "description": (
+            "Update imports across files to use new module paths. "
+            "Phrase plain module moves as 'rename module a.b to a.c' (or 'a.b -> a.c'); "
+            "those are applied instantly without an LLM call"
+        ),
         "parameters": {
             "type": "object",
             "properties": {
@@ -48,12 +64,22 @@ TOOL_REGISTRY = [
     },
     {
         "name": "run_tests",
-        "description": "Run the project test suite",
-        "parameters": {"type": "object", "properties": {}},
+        "description": (
+            "Run the tests affected by the files changed so far in this run "
+            "(the whole suite if nothing changed yet). Set 'full_suite' to run every test, "
+            "or 'path' to run one test file or folder"
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string"},
+                "full_suite": {"type": "boolean"}
+            },
+        },
     },
     {
         "name": "format_code",
-        "description": "Format code using Black",
+        "description": "Format the files modified so far in this run (under 'path') using Black",
         "parameters": {
             "type": "object",
             "properties": {
@@ -64,13 +90,28 @@ TOOL_REGISTRY = [
     }
 ]
 
+# Argument names expected by each tool, generated from the registry so they never drift
 TOOL_SIGNATURES = {
-    "refactor_code": ["path", "instruction"],
-    "update_imports": ["path", "instruction"],
-    "create_file": ["path", "content"],
-    "modify_file": ["path", "content"],
-    "backup_file": ["path"],
-    "format_code": ["path"],
-    #"commit_changes": ["description"],
+    tool["name"]: list(tool["parameters"].get("properties", {}))
+    for tool in TOOL_REGISTRY
 }
 
+
+def tool_schemas(tool_registry) -> dict:
+    """
+    Per-tool argument schema derived from the registry: the JSON type of
+    every accepted argument and the names of the required ones.
+    """
+    return {
+        tool["name"]: {
+            "properties": {
+                name: spec.get("type", "string")
+                for name, spec in tool["parameters"].get("properties", {}).items()
+            },
+            "required": list(tool["parameters"].get("required", [])),
+        }
+        for tool in tool_registry
+    }
+
+
+TOOL_SCHEMAS = tool_schemas(TOOL_REGISTRY)
@@ -1,27 +1,361 @@
 # tools/run_tests.py
+import ast
+import fnmatch
+import json
+import os
+import re
 import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agentsculptor.utils.dependency_graph import build_dependency_graph
+from agentsculptor.utils.file_ops import collect_imports
+from agentsculptor.utils.ignore import IgnoreRules
+from agentsculptor.tools.test_worker import RESPONSE_MARKER
 from agentsculptor.utils.logging import setup_logging, get_logger
 
 setup_logging("DEBUG")
 logger = get_logger()
 
-def run_tests(project_path: str):
+TEST_FILE_PATTERNS = ("test_*.py", "*_test.py")
+# Changes to these affect every test, so they always trigger the full suite
+SUITE_WIDE_FILES = ("conftest.py", "pytest.ini", "tox.ini", "setup.cfg", "pyproject.toml")
+PYTEST_ARGS = ["--maxfail=1", "--disable-warnings", "-q"]
+_SUMMARY_COUNT = re.compile(r"(\d+) (passed|failed|errors?|skipped|xfailed|xpassed|deselected|warnings?)")
+_OUTPUT_TAIL_CHARS = 2000
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_worker.py")
+
+
+def is_test_file(rel_path: str) -> bool:
+    name = os.path.basename(rel_path)
+    return any(fnmatch.fnmatch(name, pattern) for pattern in TEST_FILE_PATTERNS)
+
+
+def _python_files(project_path: str) -> list:
+    rules = IgnoreRules(project_path)
+    rel_paths = []
+    for root, dirs, files in os.walk(project_path):
+        rel_root = os.path.relpath(root, project_path)
+        rel_root = "" if rel_root == "." else rel_root
+        rules.load_gitignore(rel_root)
+        rules.prune_dirs(rel_root, dirs)
+        for file in files:
+            rel_path = os.path.join(rel_root, file) if rel_root else file
+            if file.endswith(".py") and not rules.is_ignored(rel_path):
+                rel_paths.append(rel_path)
+    return rel_paths
+
+
+def _file_imports(project_path: str, rel_path: str, store=None) -> list:
+    if store is not None:
+        try:
+            return store.analyze(os.path.join(project_path, rel_path)).get("imports", [])
+        except (OSError, UnicodeDecodeError):
+            return []
+    try:
+        with open(os.path.join(project_path, rel_path), "r", encoding="utf-8") as f:
+            return collect_imports(ast.parse(f.read()))
+    except (OSError, SyntaxError, ValueError, UnicodeDecodeError):
+        return []
+
+
+def select_tests(project_path: str, changed_files, context: dict = None, store=None):
     """
-    Run the test suite in the project directory using pytest.
+    Test files affected by ``changed_files``: changed test files plus every
+    test that imports a changed file, directly or through other project
+    modules. A changed folder stands for the files below it.
+
+    Recorded imports from ``context`` are reused for files that did not
+    change; changed files and files unknown to the context are re-parsed
+    (through ``store``, a ``FileStore``, when given).
+    Returns None when a change affects the whole suite (e.g. conftest.py).
     """
-    logger.info("[INFO] Running tests...")
-    try:
-        result = subprocess.run(
-            ["pytest", "--maxfail=1", "--disable-warnings", "-q"],
-            cwd=project_path,
-            capture_output=True,
+    changed = {os.path.normpath(p).strip(os.sep) for p in changed_files}
+    if any(os.path.basename(p) in SUITE_WIDE_FILES for p in changed):
+        return None
+
+    known = (context or {}).get("files", {})
+    files = {}
+    for rel_path in _python_files(project_path):
+        if rel_path in known and rel_path not in changed:
+            files[rel_path] = {"imports": known[rel_path].get("imports") or []}
+        else:
+            files[rel_path] = {"imports": _file_imports(project_path, rel_path, store)}
+
+    def is_changed(rel_path):
+        return any(rel_path == p or not p or p == "." or rel_path.startswith(p + os.sep) for p in changed)
+
+    _, reverse = build_dependency_graph(files)
+    affected = {p for p in files if is_changed(p)}
+    frontier = list(affected)
+    while frontier:
+        for importer in reverse.get(frontier.pop(), []):
+            if importer not in affected:
+                affected.add(importer)
+                frontier.append(importer)
+    return sorted(p for p in affected if is_test_file(p))
+
+
+def parse_pytest_summary(output: str) -> dict:
+    """Counts from pytest's final summary line (e.g. ``3 passed, 1 failed in 0.5s``)."""
+    counts = {"passed": 0, "failed": 0, "errors": 0, "skipped": 0}
+    lines = [line for line in output.strip().splitlines() if line.strip()]
+    summary = lines[-1] if lines else ""
+    for number, kind in _SUMMARY_COUNT.findall(summary):
+        if kind in ("error", "errors"):
+            kind = "errors"
+        elif kind.startswith("warning"):
+            continue
+        counts[kind] = counts.get(kind, 0) + int(number)
+    return counts
+
+
+def _run_subprocess(project_path: str, paths: list) -> dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        ["pytest", *PYTEST_ARGS, *paths],
+        cwd=project_path,
+        capture_output=True,
+        text=True,
+    )
+    return {
+        "returncode": result.returncode,
+        **parse_pytest_summary(result.stdout),
+        "duration_s": round(time.perf_counter() - started, 3),
+        "output": result.stdout + result.stderr,
+    }
+
+
+def _partition(project_path: str, paths: list, parts: int) -> list:
+    """Split test files into ``parts`` groups of similar total size (largest first)."""
+    def size(rel_path):
+        try:
+            return os.path.getsize(os.path.join(project_path, rel_path))
+        except OSError:
+            return 0
+
+    groups = [[] for _ in range(min(parts, len(paths)))]
+    totals = [0] * len(groups)
+    for rel_path in sorted(paths, key=size, reverse=True):
+        index = totals.index(min(totals))
+        groups[index].append(rel_path)
+        totals[index] += size(rel_path)
+    return [sorted(group) for group in groups]
+
+
+class WarmTestWorker:
+    """
+    A pytest process kept alive between runs (see ``test_worker.py``), so the
+    interpreter start-up, pytest's own imports and third-party imports made by
+    the tests are only paid once.
+    """
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.process = None
+        self.boot_s = None
+        self.runs = 0
+
+    def start(self) -> None:
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, self.project_path],
+            cwd=self.project_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
             text=True,
+            bufsize=1,
         )
-        print(result.stdout)
-        if result.returncode == 0:
-            logger.info("[INFO] Tests passed successfully.")
+        ready = self._read_response()
+        if not ready.get("ready"):
+            self.close()
+            raise RuntimeError(f"test worker could not start: {ready.get('error')}")
+        self.boot_s = time.perf_counter() - started
+        self.runs = 0
+
+    def _read_response(self) -> dict:
+        # Tests writing straight to file descriptor 1 end up here too: skip to our marker
+        for line in self.process.stdout:
+            if line.startswith(RESPONSE_MARKER):
+                return json.loads(line[len(RESPONSE_MARKER):])
+        raise RuntimeError("test worker exited unexpectedly")
+
+    def run(self, paths: list) -> dict:
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        self.process.stdin.write(json.dumps({"args": [*PYTEST_ARGS, *paths]}) + "\n")
+        self.process.stdin.flush()
+        result = self._read_response()
+        self.runs += 1
+        return result
+
+    def close(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+        self.process = None
+
+
+class TestRunner:
+    """
+    Runs pytest for ``run_tests``, optionally split across ``workers``
+    concurrent processes and optionally on warm workers kept alive across
+    calls (until ``close``).
+
+    The reported ``time_saved_s`` is an estimate: the per-worker durations
+    minus the wall time (the cost of running the parts back to back), plus
+    the start-up time of every warm worker that was reused.
+    """
+
+    def __init__(self, project_path: str, workers: int = None, persistent: bool = None):
+        self.project_path = project_path
+        self.workers = max(int(workers or os.environ.get("AGENTSCULPTOR_TEST_WORKERS", 1)), 1)
+        self.persistent = (
+            persistent if persistent is not None
+            else os.environ.get("AGENTSCULPTOR_WARM_TESTS", "0") == "1"
+        )
+        self._warm = []
+        self._lock = threading.Lock()
+
+    def _run_part(self, index: int, paths: list) -> dict:
+        if self.persistent:
+            with self._lock:
+                while len(self._warm) <= index:
+                    self._warm.append(WarmTestWorker(self.project_path))
+                worker = self._warm[index]
+            warm = worker.process is not None and worker.process.poll() is None
+            try:
+                result = worker.run(paths)
+            except (RuntimeError, OSError) as e:
+                logger.warning(f"[WARN] Warm test worker unavailable, using a fresh pytest process: {e}")
+                self.persistent = False
+                return _run_subprocess(self.project_path, paths)
+            # A reused worker skipped a cold start
+            result["saved_s"] = worker.boot_s if warm else 0.0
+            return result
+        return _run_subprocess(self.project_path, paths)
+
+    def run(self, selected=None) -> dict:
+        """Run ``selected`` test files (None: the whole suite) and merge the results."""
+        if self.workers > 1:
+            paths = selected if selected is not None else sorted(
+                p for p in _python_files(self.project_path) if is_test_file(p)
+            )
+            parts = _partition(self.project_path, paths, self.workers) or [[]]
         else:
-            logger.error("[ERROR] Tests failed.")
-            print(result.stderr)
+            parts = [selected or []]
+
+        started = time.perf_counter()
+        if len(parts) == 1:
+            results = [self._run_part(0, parts[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+                results = list(pool.map(self._run_part, range(len(parts)), parts))
+        wall = time.perf_counter() - started
+
+        merged = {key: sum(r.get(key, 0) for r in results) for key in ("passed", "failed", "errors", "skipped")}
+        codes = [r["returncode"] for r in results]
+        failing = [code for code in codes if code not in (0, 5)]
+        returncode = failing[0] if failing else (5 if all(code == 5 for code in codes) else 0)
+
+        parallel_saved = max(sum(r["duration_s"] for r in results) - wall, 0.0)
+        warm_saved = sum(r.get("saved_s", 0.0) for r in results)
+        return {
+            "returncode": returncode,
+            **merged,
+            "duration_s": round(wall, 3),
+            "workers": len(parts),
+            "time_saved_s": round(parallel_saved + warm_saved, 3),
+            "output": "\n".join(r["output"] for r in results),
+        }
+
+    def close(self) -> None:
+        for worker in self._warm:
+            worker.close()
+        self._warm = []
+
+
+def run_tests(
+    project_path: str,
+    changed_files=None,
+    context: dict = None,
+    full_suite: bool = False,
+    fallback_to_full: bool = False,
+    paths=None,
+    runner: TestRunner = None,
+    store=None,
+) -> dict:
+    """
+    Run the test suite in the project directory using pytest.
+
+    With ``changed_files`` only the tests affected by those files are run
+    (see ``select_tests``); ``full_suite`` or no changed files runs
+    everything. If no test is affected, nothing runs unless
+    ``fallback_to_full`` is set. Explicit test ``paths`` override selection.
+    Tests run through ``runner`` (parallel and/or warm workers) if given;
+    changed files are parsed through ``store`` if given.
+
+    Returns a summary with the outcome, pass/fail counts, the selected tests,
+    the wall-clock duration and the time saved by parallel or warm workers.
+    """
+    selected = None
+    if paths:
+        selected = list(paths)
+    elif changed_files and not full_suite:
+        selected = select_tests(project_path, changed_files, context, store)
+        if selected is None:
+            logger.info("[INFO] Suite-wide file changed, running the full test suite.")
+        elif not selected and fallback_to_full:
+            logger.info("[INFO] No tests import the changed files, running the full test suite.")
+            selected = None
+        elif not selected:
+            logger.info("[INFO] No tests import the changed files, skipping test run.")
+            return {"status": "no_tests", "passed": 0, "failed": 0, "errors": 0, "skipped": 0,
+                    "selected": [], "duration_s": 0.0}
+
+    scope = "full suite" if selected is None else f"{len(selected)} selected test file(s)"
+    logger.info(f"[INFO] Running tests ({scope})...")
+    own_runner = runner is None
+    runner = runner or TestRunner(project_path)
+    try:
+        result = runner.run(selected)
     except FileNotFoundError:
         logger.error("[ERROR] pytest is not installed or not found in PATH.")
+        return {"status": "error", "error": "pytest is not installed or not found in PATH."}
+    finally:
+        if own_runner:
+            runner.close()
+
+    print(result["output"])
+    counts = {key: result[key] for key in ("passed", "failed", "errors", "skipped")}
+    duration = result["duration_s"]
+    if result["returncode"] == 0:
+        status = "passed"
+        logger.info(f"[INFO] Tests passed successfully ({counts['passed']} passed in {duration:.2f}s).")
+    elif result["returncode"] == 5:
+        status = "no_tests"
+        logger.info("[INFO] No tests were collected.")
+    else:
+        status = "failed"
+        logger.error(f"[ERROR] Tests failed ({counts['failed']} failed, {counts['errors']} errors).")
+    if result["time_saved_s"]:
+        logger.info(
+            f"[INFO] Test run took {duration:.2f}s with {result['workers']} worker(s), "
+            f"~{result['time_saved_s']:.2f}s saved by parallel/warm workers."
+        )
+
+    return {
+        "status": status,
+        **counts,
+        "selected": "all" if selected is None else selected,
+        "duration_s": duration,
+        "time_saved_s": result["time_saved_s"],
+        "workers": result["workers"],
+        "returncode": result["returncode"],
+        "output": result["output"][-_OUTPUT_TAIL_CHARS:],
+    }
@@ -0,0 +1,99 @@
+# tools/test_worker.py
+"""
+Long-lived pytest worker.
+
+Started by ``run_tests.WarmTestWorker`` as ``python test_worker.py <project_path>``.
+Reads one JSON request per line on stdin (``{"args": [...]}``), runs
+``pytest.main`` in-process and answers with one JSON line prefixed by
+``RESPONSE_MARKER``. Third-party imports stay loaded between runs; project
+modules are dropped from ``sys.modules`` first so edits are always picked up.
+
+Only the standard library and pytest are imported here, so the worker starts
+quickly and does not depend on the agent's own modules.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+RESPONSE_MARKER = "@@agentsculptor-test-worker@@ "
+
+
+class _OutcomeCounter:
+    """pytest plugin counting test outcomes like the terminal summary does."""
+
+    def __init__(self):
+        self.counts = {"passed": 0, "failed": 0, "errors": 0, "skipped": 0}
+
+    def pytest_runtest_logreport(self, report):
+        if report.when == "call" or (report.when == "setup" and not report.passed):
+            if report.failed:
+                self.counts["failed" if report.when == "call" else "errors"] += 1
+            elif report.skipped:
+                self.counts["skipped"] += 1
+            elif report.passed:
+                self.counts["passed"] += 1
+        elif report.when == "teardown" and report.failed:
+            self.counts["errors"] += 1
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.counts["errors"] += 1
+
+
+def _purge_project_modules(project_path: str) -> None:
+    # The project may be a workspace of symlinks: match the import path, not only its target
+    roots = (os.path.abspath(project_path) + os.sep, os.path.realpath(project_path) + os.sep)
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and (os.path.abspath(path).startswith(roots) or os.path.realpath(path).startswith(roots)):
+            del sys.modules[name]
+
+
+def _respond(stream, payload: dict) -> None:
+    stream.write(RESPONSE_MARKER + json.dumps(payload) + "\n")
+    stream.flush()
+
+
+def main() -> None:
+    project_path = os.path.abspath(sys.argv[1])
+    # Behave like the pytest console script: the worker's own folder is not importable
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != script_dir]
+    os.chdir(project_path)
+
+    # Keep the protocol channel for ourselves; test output goes to a buffer
+    channel = sys.stdout
+    try:
+        import pytest
+    except ImportError as e:
+        _respond(channel, {"ready": False, "error": str(e)})
+        return
+    _respond(channel, {"ready": True})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        _purge_project_modules(project_path)
+        counter = _OutcomeCounter()
+        output = io.StringIO()
+        started = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                returncode = int(pytest.main(request["args"], plugins=[counter]))
+        except Exception as e:  # pytest internal error: report it instead of dying
+            returncode = 3
+            output.write(f"\n{type(e).__name__}: {e}\n")
+        _respond(channel, {
+            "returncode": returncode,
+            **counter.counts,
+            "duration_s": round(time.perf_counter() - started, 3),
+            "output": output.getvalue(),
+        })
+
+
+if __name__ == "__main__":
+    main()
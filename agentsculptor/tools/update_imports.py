@@ -1,8 +1,14 @@
 # tools/update_imports.py
+import asyncio
 import os
 import re
-from agentsculptor.llm.client import VLLMClient
+import time
+from agentsculptor.llm.client import VLLMClient, AsyncVLLMClient
 from agentsculptor.llm.prompts import build_import_messages
+from agentsculptor.tools.import_rewriter import parse_rename_instruction, rewrite_imports, UnsupportedImport
+from agentsculptor.utils.file_store import read_source, write_source
+from agentsculptor.utils.ignore import IgnoreRules
+from agentsculptor.utils.dependency_graph import importers_of
 
 from agentsculptor.utils.logging import setup_logging, get_logger
 
@@ -14,12 +20,105 @@ base_url = (None or os.environ.get("VLLM_URL", "http://localhost:8008")).rstrip(
 model = None or os.environ.get("VLLM_MODEL", "openai/gpt-oss-120b")
 
 llm_client = VLLMClient(base_url=base_url, model=model)
+async_llm_client = AsyncVLLMClient(client=llm_client)
 
 
-def update_imports(project_path: str, relative_path: str, instruction: str = None, context: str = None):
+def _python_files(project_path: str, full_path: str) -> list:
+    """Relative paths of all .py files below ``full_path``, in walk order."""
+    rules = IgnoreRules(project_path, use_gitignore=False)
+    rel_paths = []
+    for root, dirs, files in os.walk(full_path):
+        rel_root = os.path.relpath(root, project_path)
+        rules.prune_dirs("" if rel_root == "." else rel_root, dirs)
+        for file in files:
+            if file.endswith(".py"):
+                rel_paths.append(os.path.relpath(os.path.join(root, file), project_path))
+    return rel_paths
+
+
+def _target_files(project_path: str, full_path: str, instruction: str, context) -> list:
+    """
+    Files to process in folder mode.
+
+    For plain renames with a project context at hand, only files that import
+    a renamed module (per the context's recorded imports) are kept, plus any
+    file created after the context was built.
+    """
+    rel_paths = _python_files(project_path, full_path)
+    renames = parse_rename_instruction(instruction)
+    if not renames or not isinstance(context, dict) or "files" not in context:
+        return rel_paths
+
+    known = context["files"]
+    affected = set(importers_of(context, [old for old, _ in renames]))
+    targets = [p for p in rel_paths if p in affected or p not in known]
+    logger.info(f"[INFO] Import graph narrowed {len(rel_paths)} files to {len(targets)} affected files.")
+    return targets
+
+
+def _no_instruction_update(original_code: str) -> str:
+    return (
+        "# [TODO] No import update instruction was provided.\n"
+        "# Please update the imports manually if needed.\n\n"
+        + original_code
+    )
+
+
+def _clean_llm_update(response: str, original_code: str) -> str:
+    updated_code = re.sub(
+        r"^```(?:python)?\n|```$", "", response.strip(), flags=re.MULTILINE
+    ).strip()
+
+    if not updated_code:
+        logger.warning("[WARN] LLM returned empty update for imports, falling back to original code.")
+        updated_code = original_code
+    return updated_code
+
+
+def _write_update(full_path: str, relative_path: str, updated_code: str, mode: str = "llm", store=None) -> None:
+    write_source(full_path, updated_code, store)
+
+    logger.info(f"[INFO] Updated imports in {relative_path} ({mode})")
+
+
+def _local_update(relative_path: str, original_code: str, renames, require_match: bool = False):
+    """
+    Rewrite imports with the AST engine; None means the LLM is needed.
+
+    With ``require_match`` a file in which no import matched a renamed module
+    also goes to the LLM: the instruction was most likely not a plain rename.
+    """
+    try:
+        updated_code, changed = rewrite_imports(original_code, renames)
+    except UnsupportedImport as e:
+        logger.debug(f"[DEBUG] Falling back to LLM for {relative_path}: {e}")
+        return None
+    if require_match and not changed:
+        logger.debug(f"[DEBUG] No import in {relative_path} matches the renames, falling back to LLM.")
+        return None
+    return updated_code
+
+
+def update_imports(
+    project_path: str,
+    relative_path: str,
+    instruction: str = None,
+    context: str = None,
+    workers: int = None,
+    store=None,
+):
     """
     Update Python import statements in a file or folder using an LLM,
     with access to relevant project context (passed in by the caller).
+
+    Plain module renames/moves ("rename module a.b to a.c", "a.b -> a.c")
+    are applied locally with the AST rewriter; the LLM is only used for
+    other instructions or files the rewriter cannot handle safely.
+
+    In folder mode files are processed by up to ``workers`` concurrent
+    requests and a summary of the run is returned; RuntimeError names the
+    files that failed, if any. Files are read and written through ``store``
+    (a ``FileStore``) when given.
     """
     full_path = os.path.join(project_path, relative_path)
 
@@ -29,37 +128,134 @@ def update_imports(project_path: str, relative_path: str, instruction: str = Non
 
     # Folder mode — process recursively
     if os.path.isdir(full_path):
-        for root, _, files in os.walk(full_path):
-            for file in files:
-                if file.endswith(".py"):
-                    rel_file_path = os.path.relpath(os.path.join(root, file), project_path)
-                    update_imports(project_path, rel_file_path, instruction, context=context)
-        return
+        return asyncio.run(
+            update_imports_async(
+                project_path, relative_path, instruction, context=context, workers=workers, store=store
+            )
+        )
 
-    with open(full_path, "r", encoding="utf-8") as f:
-        original_code = f.read()
+    original_code = read_source(full_path, store)
 
+    mode = "llm"
+    renames = parse_rename_instruction(instruction)
     if not instruction:
-        updated_code = (
-            "# [TODO] No import update instruction was provided.\n"
-            "# Please update the imports manually if needed.\n\n"
-            + original_code
-        )
+        updated_code = _no_instruction_update(original_code)
+    elif renames and (updated_code := _local_update(relative_path, original_code, renames, True)) is not None:
+        mode = "local"
     else:
         # Build prompt for the LLM
         messages = build_import_messages(original_code, instruction, context)
         response = llm_client.chat(messages=messages, max_tokens=4096, temperature=0.0)
+        updated_code = _clean_llm_update(response, original_code)
 
+    _write_update(full_path, relative_path, updated_code, mode, store)
 
-        updated_code = re.sub(
-            r"^```(?:python)?\n|```$", "", response.strip(), flags=re.MULTILINE
-        ).strip()
 
-        if not updated_code:
-            logger.warning("[WARN] LLM returned empty update for imports, falling back to original code.")
-            updated_code = original_code
+async def _update_file_async(
+    project_path, relative_path, instruction, context, client, store=None, require_match=False
+):
+    """
+    Update one file and return how it was handled: "local" or "llm".
+    ``require_match`` is passed on to ``_local_update``; folder mode leaves it
+    off, since most files of a folder are not expected to import the module.
+    """
+    full_path = os.path.join(project_path, relative_path)
+    original_code = read_source(full_path, store)
+
+    renames = parse_rename_instruction(instruction)
+    if renames:
+        updated_code = _local_update(relative_path, original_code, renames, require_match)
+        if updated_code is not None:
+            if updated_code != original_code:
+                _write_update(full_path, relative_path, updated_code, "local", store)
+            return "local"
+
+    if not instruction:
+        updated_code = _no_instruction_update(original_code)
+    else:
+        messages = build_import_messages(original_code, instruction, context)
+        response = await client.chat(messages=messages, max_tokens=4096, temperature=0.0)
+        updated_code = _clean_llm_update(response, original_code)
+
+    _write_update(full_path, relative_path, updated_code, store=store)
+    return "llm"
+
+
+async def _update_folder_async(project_path, rel_paths, instruction, context, client, workers, store=None):
+    total = len(rel_paths)
+    limit = asyncio.Semaphore(workers)
+    latencies = {}
+    failed = {}
+    modes = {"local": 0, "llm": 0}
+    done = 0
+    started = time.perf_counter()
+
+    async def run_one(rel_path):
+        nonlocal done
+        async with limit:
+            file_started = time.perf_counter()
+            try:
+                modes[await _update_file_async(project_path, rel_path, instruction, context, client, store)] += 1
+            except Exception as e:
+                failed[rel_path] = str(e)
+            latencies[rel_path] = round(time.perf_counter() - file_started, 3)
+        done += 1
+        status = "failed" if rel_path in failed else "ok"
+        logger.info(f"[INFO] [{done}/{total}] {rel_path}: {status} ({latencies[rel_path]:.2f}s)")
+
+    await asyncio.gather(*(run_one(rel_path) for rel_path in rel_paths))
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"[INFO] Updated imports in {total - len(failed)}/{total} files "
+        f"in {elapsed:.2f}s with {workers} workers ({modes['local']} local, {modes['llm']} via LLM)."
+    )
+    for rel_path, error in failed.items():
+        logger.error(f"[ERROR] Import update failed for {rel_path}: {error}")
+    if failed:
+        # Surface as a step error so the agent re-plans instead of stopping with half-updated imports
+        details = "; ".join(f"{rel_path}: {error}" for rel_path, error in failed.items())
+        raise RuntimeError(f"Import update failed for {len(failed)}/{total} files: {details}")
 
-    with open(full_path, "w", encoding="utf-8") as f:
-        f.write(updated_code)
+    return {
+        "files": total,
+        "handled_locally": modes["local"],
+        "handled_by_llm": modes["llm"],
+        "elapsed_s": round(elapsed, 3),
+        "latencies_s": {rel_path: latencies[rel_path] for rel_path in rel_paths},
+    }
+
+
+async def update_imports_async(
+    project_path: str,
+    relative_path: str,
+    instruction: str = None,
+    context: str = None,
+    client: AsyncVLLMClient = None,
+    workers: int = None,
+    store=None,
+):
+    """
+    Async variant of ``update_imports``.
+
+    In folder mode up to ``workers`` files (default: the client's concurrency
+    limit, or ``AGENTSCULPTOR_IMPORT_WORKERS``) are in flight at once. Every
+    file is written atomically, so a failure part-way through leaves each
+    source either fully updated or untouched. A failing file does not stop
+    the others; once all are done, RuntimeError names the files that failed.
+    """
+    client = client or async_llm_client
+    full_path = os.path.join(project_path, relative_path)
+
+    if not os.path.exists(full_path):
+        logger.warning(f"[WARN] Path {relative_path} not found for import update.")
+        return
+
+    if os.path.isdir(full_path):
+        workers = workers or int(os.environ.get("AGENTSCULPTOR_IMPORT_WORKERS", client.max_concurrency))
+        rel_paths = _target_files(project_path, full_path, instruction, context)
+        return await _update_folder_async(
+            project_path, rel_paths, instruction, context, client, max(workers, 1), store
+        )
 
-    logger.info(f"[INFO] Updated imports in {relative_path}")
+    await _update_file_async(project_path, relative_path, instruction, context, client, store, require_match=True)
@@ -0,0 +1,124 @@
+# utils/context_cache.py
+import hashlib
+import json
+import os
+from agentsculptor.utils.logging import setup_logging, get_logger
+
+setup_logging("DEBUG")
+logger = get_logger()
+
+CACHE_DIR_NAME = ".agentsculptor"
+CACHE_FILE_NAME = "context_cache.json"
+CACHE_VERSION = 3
+
+
+def hash_file(path: str) -> str:
+    """Return the SHA-256 hex digest of a file's raw bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContextCache:
+    """
+    On-disk cache of per-file context entries.
+
+    Entries are keyed by relative path and validated against the file's
+    mtime and size first; if those changed, the content hash decides whether
+    the cached analysis can still be reused. Entries for files that were not
+    seen during the current run are dropped on save.
+    """
+
+    def __init__(self, project_path: str, settings: dict = None, cache_path: str = None):
+        self.project_path = project_path
+        self.cache_path = cache_path or os.path.join(project_path, CACHE_DIR_NAME, CACHE_FILE_NAME)
+        self.settings = settings or {}
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._fresh = {}
+        self._pending = {}
+        self.load()
+
+    def load(self) -> None:
+        """Load entries from disk, discarding them if the version or settings differ."""
+        self.entries = {}
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug(f"[DEBUG] Ignoring unreadable context cache {self.cache_path}: {e}")
+            return
+
+        if data.get("version") != CACHE_VERSION or data.get("settings") != self.settings:
+            logger.debug("[DEBUG] Context cache settings changed, starting from an empty cache.")
+            return
+        self.entries = data.get("entries", {})
+
+    def get(self, rel_path: str, file_path: str):
+        """Return the cached file info for ``rel_path`` if still valid, else None."""
+        stat = os.stat(file_path)
+        entry = self.entries.get(rel_path)
+
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            self._fresh[rel_path] = entry
+            self.hits += 1
+            return entry["info"]
+
+        digest = hash_file(file_path)
+        if entry and entry["sha256"] == digest:
+            # Touched but unchanged: keep the analysis, refresh the stat key
+            self._fresh[rel_path] = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            self.hits += 1
+            return entry["info"]
+
+        self._pending[rel_path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest,
+        }
+        self.misses += 1
+        return None
+
+    def put(self, rel_path: str, info: dict) -> None:
+        """Store freshly computed file info for a path previously missed by ``get``."""
+        meta = self._pending.pop(rel_path, None)
+        if meta is None:
+            return
+        self._fresh[rel_path] = {**meta, "info": info}
+
+    def save(self) -> None:
+        """Persist the entries seen during this run atomically."""
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        data = {
+            "version": CACHE_VERSION,
+            "settings": self.settings,
+            "entries": self._fresh,
+        }
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.error(f"[ERROR] Failed to write context cache {self.cache_path}: {e}")
+            return
+        self.entries = self._fresh
+        self._fresh = {}
+        self._pending = {}
+
+    def clear(self) -> None:
+        """Invalidate the cache, removing it from disk."""
+        self.entries = {}
+        self._fresh = {}
+        self._pending = {}
+        if os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
+            logger.info(f"[INFO] Cleared context cache {self.cache_path}")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
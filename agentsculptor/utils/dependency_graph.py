@@ -0,0 +1,195 @@
+# utils/dependency_graph.py
+import os
+import posixpath
+
+
+def module_names(rel_path: str) -> list:
+    """
+    Candidate dotted names under which a project file can be imported.
+
+    The project may be run as a package, from a ``src/`` layout or as scripts
+    from inside a folder, so every dotted suffix of the path is a candidate:
+    ``src/pkg/mod.py`` -> ``src.pkg.mod``, ``pkg.mod``, ``mod``.
+    """
+    path = rel_path.replace(os.sep, "/")
+    if path.endswith(".py"):
+        path = path[:-3]
+    parts = path.split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts)) if parts[i:]]
+
+
+def build_module_index(paths) -> dict:
+    """Map every candidate dotted name to the project files that provide it."""
+    index = {}
+    for rel_path in paths:
+        if not rel_path.endswith(".py"):
+            continue
+        for name in module_names(rel_path):
+            index.setdefault(name, []).append(rel_path)
+    return index
+
+
+def _pick(candidates: list, importer: str) -> str:
+    # Prefer the candidate closest to the importer (script-style sibling imports)
+    importer_dir = posixpath.dirname(importer.replace(os.sep, "/"))
+
+    def distance(candidate):
+        common = posixpath.commonpath([importer_dir, posixpath.dirname(candidate)]) if importer_dir else ""
+        return (-len(common), candidate)
+
+    return min(candidates, key=distance)
+
+
+def absolute_import(name: str, importer: str) -> str:
+    """Resolve a relative import string (``..x.y``) against the importer's path."""
+    if not name.startswith("."):
+        return name
+    level = len(name) - len(name.lstrip("."))
+    rest = name[level:]
+    package = posixpath.dirname(importer.replace(os.sep, "/")).split("/")
+    package = [p for p in package if p]
+    if level - 1 > len(package):
+        return rest
+    base = package[: len(package) - (level - 1)]
+    return ".".join(base + ([rest] if rest else []))
+
+
+def resolve_import(name: str, importer: str, index: dict):
+    """Return the project file an import string refers to, or None if external."""
+    parts = absolute_import(name, importer).split(".")
+    # ``from a.b import c`` is recorded as ``a.b.c``: try the longest module first
+    for end in range(len(parts), 0, -1):
+        candidates = index.get(".".join(parts[:end]))
+        if candidates:
+            return _pick(candidates, importer)
+    return None
+
+
+def _file_dependencies(rel_path: str, imports, index: dict) -> list:
+    deps = []
+    for name in imports or []:
+        target = resolve_import(name, rel_path, index)
+        if target and target != rel_path and target not in deps:
+            deps.append(target)
+    return deps
+
+
+def build_dependency_graph(files: dict):
+    """
+    Build the module-level import graph of a project context's ``files``.
+
+    Returns ``(graph, reverse)`` where ``graph[path]`` lists the project files
+    ``path`` imports and ``reverse[path]`` lists the files importing ``path``.
+    Both only contain project files; stdlib and third-party imports are dropped.
+    """
+    index = build_module_index(files)
+    graph = {}
+    reverse = {}
+    for rel_path, info in files.items():
+        deps = _file_dependencies(rel_path, info.get("imports"), index)
+        if deps:
+            graph[rel_path] = deps
+        for target in deps:
+            reverse.setdefault(target, []).append(rel_path)
+    return graph, reverse
+
+
+def update_dependency_graph(context: dict, rel_paths, index: dict = None) -> list:
+    """
+    Patch the context's ``dependency_graph`` and ``reverse_dependencies`` in
+    place after the entries of ``rel_paths`` changed, were added or removed.
+
+    Only the edges of those files are recomputed, plus the edges of files
+    whose recorded imports name a module of an added or removed file. ``index``
+    is the module index from before the change (``build_module_index``); it
+    is updated in place so callers can keep it across calls. Without it, one
+    is built from the unchanged files. Returns the files whose edges were
+    recomputed.
+    """
+    files = context.get("files", {})
+    graph = context.setdefault("dependency_graph", {})
+    reverse = context.setdefault("reverse_dependencies", {})
+    changed = set(rel_paths)
+    if index is None:
+        index = build_module_index(p for p in files if p not in changed)
+
+    # Files whose module names appear in or disappear from the index
+    moved = []
+    for rel_path in sorted(p for p in changed if p.endswith(".py")):
+        names = module_names(rel_path)
+        if not names:  # a root-level __init__.py provides no importable name
+            continue
+        indexed = rel_path in index.get(names[0], [])
+        if (rel_path in files) == indexed:
+            continue
+        moved.append(rel_path)
+        for name in names:
+            providers = index.setdefault(name, [])
+            if indexed:
+                providers.remove(rel_path)
+                if not providers:
+                    del index[name]
+            else:
+                providers.append(rel_path)
+
+    stale = set(changed)
+    if moved:
+        stale.update(importers_of(context, [name for p in moved for name in module_names(p)]))
+
+    for rel_path in sorted(stale):
+        for target in graph.pop(rel_path, []):
+            importers = reverse.get(target, [])
+            if rel_path in importers:
+                importers.remove(rel_path)
+            if not importers:
+                reverse.pop(target, None)
+        deps = _file_dependencies(rel_path, files.get(rel_path, {}).get("imports"), index)
+        if deps:
+            graph[rel_path] = deps
+        for target in deps:
+            reverse.setdefault(target, []).append(rel_path)
+    return sorted(stale)
+
+
+def importers_of(context: dict, modules) -> list:
+    """
+    Files whose imports reference any of the dotted ``modules`` (or anything
+    below them), e.g. the files to touch when ``modules`` are renamed.
+
+    Works from the recorded import strings, so it still finds importers of a
+    module whose file has already been moved or deleted.
+    """
+    modules = list(modules)
+    affected = []
+    for rel_path, info in context.get("files", {}).items():
+        for name in info.get("imports") or []:
+            resolved = absolute_import(name, rel_path)
+            if name.startswith("."):
+                # Path-based resolution may carry a src/ style prefix, so match anywhere
+                hit = any(f".{m}." in f".{resolved}." for m in modules)
+            else:
+                hit = any(resolved == m or resolved.startswith(m + ".") for m in modules)
+            if hit:
+                affected.append(rel_path)
+                break
+    return affected
+
+
+def dependents(context: dict, rel_paths, transitive: bool = False) -> list:
+    """Files that import any of ``rel_paths`` (optionally transitively)."""
+    reverse = context.get("reverse_dependencies", {})
+    seen = set(rel_paths)
+    frontier = list(rel_paths)
+    result = []
+    while frontier:
+        current = frontier.pop(0)
+        for importer in reverse.get(current, []):
+            if importer in seen:
+                continue
+            seen.add(importer)
+            result.append(importer)
+            if transitive:
+                frontier.append(importer)
+    return result
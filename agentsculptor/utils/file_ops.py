@@ -1,5 +1,6 @@
 import os
 import shutil
+import tempfile
 import ast
 from agentsculptor.tools.dialog import DialogManager
 from agentsculptor.utils.logging import setup_logging, get_logger
@@ -22,23 +23,45 @@ def read_file(path: str) -> str:
     return ""
 
 
-def write_file(path: str, content: str, instruction: str = ""):
+def write_file(path: str, content: str, instruction: str = "", store=None):
     """
     Write content to a file, creating directories if needed.
     If the file does not exist, ask the user for confirmation before creation.
+    With a ``FileStore`` the write goes through it so other tools see it.
     """
     try:
         if not os.path.exists(path):
             if not DialogManager.confirm_file_creation(path, instruction):
                 logger.info(f"[INFO] Skipping creation of {path}")
                 return
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
+        if store is not None:
+            store.write(path, content)
+        else:
+            atomic_write(path, content)
     except Exception as e:
         logger.error(f"[ERROR] Failed to write to {path}: {e}")
 
 
+def atomic_write(path: str, content: str) -> None:
+    """
+    Write content via a temporary file in the same directory and rename it
+    into place, so readers never see a half-written file. Raises on failure.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def backup_file(path: str, suffix=".bak") -> str:
     """Rename a file to create a backup. Returns backup path."""
     try:
@@ -78,32 +101,38 @@ def delete_file(path: str):
         logger.error(f"[ERROR] Failed to delete {path}: {e}")
 
 
-def modify_file(path: str, content: str, instruction: str = ""):
+def modify_file(path: str, content: str, instruction: str = "", store=None):
     """
     Modify (overwrite) an existing file's content, creating directories if needed.
     If the file does not exist, ask before creating it.
+    With a ``FileStore`` the write goes through it so other tools see it.
     """
     try:
         if not os.path.exists(path):
             if not DialogManager.confirm_file_creation(path, instruction):
                 logger.info(f"[INFO] Skipping modification — {path} not created.")
                 return
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
+        if store is not None:
+            store.write(path, content)
+        else:
+            atomic_write(path, content)
     except Exception as e:
         logger.error(f"Failed to modify {path}: {e}")
 
 
-def analyze_file(path: str) -> dict:
+def analyze_file(path: str, content: str = None) -> dict:
     """
     Analyze a Python file to identify logical sections:
     - Counts of functions and classes
     - List of top-level functions and classes with their line numbers
+      (``start_lineno`` includes decorators, ``end_lineno`` is inclusive)
+    - Imported module/symbol names
 
+    ``content`` skips reading ``path`` when the source is already at hand.
     Returns a dictionary summary.
     """
-    content = read_file(path)
+    if content is None:
+        content = read_file(path)
     if not content:
         return {}
 
@@ -120,10 +149,14 @@ def analyze_file(path: str) -> dict:
     classes = []
 
     for node in ast.iter_child_nodes(tree):
-        if isinstance(node, ast.FunctionDef):
-            functions.append({"name": node.name, "lineno": node.lineno})
-        elif isinstance(node, ast.ClassDef):
-            classes.append({"name": node.name, "lineno": node.lineno})
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            entry = {
+                "name": node.name,
+                "lineno": node.lineno,
+                "start_lineno": min([d.lineno for d in node.decorator_list] + [node.lineno]),
+                "end_lineno": node.end_lineno,
+            }
+            (classes if isinstance(node, ast.ClassDef) else functions).append(entry)
 
     return {
         "path": path,
@@ -132,4 +165,29 @@ def analyze_file(path: str) -> dict:
         "functions": functions,
         "num_classes": len(classes),
         "classes": classes,
+        "imports": collect_imports(tree),
     }
+
+
+def collect_imports(tree: ast.AST) -> list:
+    """
+    List the names imported anywhere in a module, top-level imports first.
+
+    ``import a.b`` gives ``"a.b"`` and ``from a import b`` gives ``"a.b"``
+    (``b`` may be a submodule or a symbol). Relative imports keep their
+    leading dots, e.g. ``from ..x import y`` gives ``"..x.y"``.
+    """
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            prefix = "." * node.level + (node.module or "")
+            for alias in node.names:
+                if alias.name == "*":
+                    imports.append(prefix)
+                elif prefix.endswith(".") or not prefix:
+                    imports.append(prefix + alias.name)
+                else:
+                    imports.append(f"{prefix}.{alias.name}")
+    return list(dict.fromkeys(imports))
@@ -0,0 +1,115 @@
+# utils/file_store.py
+import os
+import threading
+from agentsculptor.utils.file_ops import atomic_write, analyze_file
+from agentsculptor.utils.logging import setup_logging, get_logger
+
+setup_logging("DEBUG")
+logger = get_logger()
+
+
+class FileStore:
+    """
+    In-memory view of the project files shared by all tools of one run.
+
+    Files are read from disk on first access and kept; writes go to disk
+    immediately (write-through, via ``atomic_write``) and replace the cached
+    copy. Paths may be given relative to ``root`` or absolute. Every write is
+    remembered until ``drain_changes`` so callers can refresh what they
+    derived from the old content, and for the whole run in ``written``.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._files = {}
+        self._analyses = {}
+        self._changed = set()
+        self._written = set()
+        self._lock = threading.RLock()
+        self.disk_reads = 0
+        self.hits = 0
+
+    def relpath(self, path: str) -> str:
+        return os.path.normpath(os.path.relpath(os.path.join(self.root, path), self.root))
+
+    def full_path(self, path: str) -> str:
+        return os.path.join(self.root, self.relpath(path))
+
+    def seed(self, path: str, content: str) -> None:
+        """Cache content already read elsewhere (e.g. by ``prepare_context``) unless known."""
+        with self._lock:
+            self._files.setdefault(self.relpath(path), content)
+
+    def seed_context(self, context: dict) -> int:
+        """
+        Seed the store with the file contents captured by ``prepare_context``.
+        Truncated contents (shorter than the file) are skipped. Returns the
+        number of files seeded.
+        """
+        seeded = 0
+        for rel_path, info in context.get("files", {}).items():
+            content = info.get("content")
+            if isinstance(content, str) and len(content.encode("utf-8")) == info.get("size_bytes"):
+                self.seed(rel_path, content)
+                seeded += 1
+        return seeded
+
+    def read(self, path: str) -> str:
+        """Content of ``path``; raises like ``open`` if it cannot be read."""
+        rel_path = self.relpath(path)
+        with self._lock:
+            if rel_path in self._files:
+                self.hits += 1
+                return self._files[rel_path]
+            with open(os.path.join(self.root, rel_path), "r", encoding="utf-8") as f:
+                content = f.read()
+            self.disk_reads += 1
+            self._files[rel_path] = content
+            return content
+
+    def write(self, path: str, content: str) -> None:
+        rel_path = self.relpath(path)
+        atomic_write(os.path.join(self.root, rel_path), content)
+        with self._lock:
+            self._files[rel_path] = content
+            self._analyses.pop(rel_path, None)
+            self._changed.add(rel_path)
+            self._written.add(rel_path)
+
+    def analyze(self, path: str) -> dict:
+        """``analyze_file`` on the cached content, memoized until the file is written."""
+        rel_path = self.relpath(path)
+        with self._lock:
+            if rel_path not in self._analyses:
+                self._analyses[rel_path] = analyze_file(os.path.join(self.root, rel_path), content=self.read(rel_path))
+            return self._analyses[rel_path]
+
+    def drain_changes(self) -> set:
+        """Relative paths written since the last call."""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            return changed
+
+    def written(self) -> list:
+        """Relative paths written since the store was created."""
+        with self._lock:
+            return sorted(self._written)
+
+    def stats(self) -> dict:
+        return {"files": len(self._files), "disk_reads": self.disk_reads, "hits": self.hits}
+
+
+def read_source(path: str, store: FileStore = None) -> str:
+    """Read ``path`` through ``store`` when one is given, else from disk."""
+    if store is not None:
+        return store.read(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def write_source(path: str, content: str, store: FileStore = None) -> None:
+    """Atomically write ``path``, keeping ``store`` (if given) up to date."""
+    if store is not None:
+        store.write(path, content)
+    else:
+        atomic_write(path, content)
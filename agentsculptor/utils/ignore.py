@@ -0,0 +1,180 @@
+# utils/ignore.py
+import os
+import re
+from agentsculptor.utils.logging import setup_logging, get_logger
+
+setup_logging("DEBUG")
+logger = get_logger()
+
+# Directories that never contain anything the agent should look at. Names that can
+# also be source packages (``src/app/build/``) are only excluded at the project root.
+DEFAULT_EXCLUDES = [
+    ".git/", ".hg/", ".svn/",
+    ".venv/", "/venv/", "/env/", ".env/",
+    "node_modules/",
+    "__pycache__/", ".mypy_cache/", ".pytest_cache/", ".ruff_cache/",
+    ".tox/", ".nox/", ".eggs/", "*.egg-info/",
+    "/build/", "/dist/",
+    ".idea/",
+    ".agentsculptor/",
+]
+# Marks a virtualenv at any depth, whatever its name
+VIRTUALENV_MARKER = "pyvenv.cfg"
+
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob (without leading '/' or trailing '/') to a regex."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif ch == "*":
+            out.append("[^/]*")
+            i += 1
+        elif ch == "?":
+            out.append("[^/]")
+            i += 1
+        elif ch == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(ch))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        else:
+            out.append(re.escape(ch))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRule:
+    """A single gitignore-style pattern, relative to the directory it was declared in."""
+
+    def __init__(self, pattern: str, base: str = ""):
+        self.negated = pattern.startswith("!")
+        if self.negated:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        regex = _translate(pattern)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        self.base = base
+        self.regex = re.compile(regex + r"\Z")
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        return bool(self.regex.match(rel_path))
+
+
+class IgnoreRules:
+    """
+    Decide which directories and files the context walk may visit.
+
+    Combines the built-in excludes, user supplied exclude/include globs and
+    any ``.gitignore`` files found along the way. As in git, the last
+    matching rule wins and ``!pattern`` re-includes a path. With the built-in
+    excludes, folders holding a ``pyvenv.cfg`` are skipped as virtualenvs.
+    """
+
+    def __init__(
+        self,
+        project_path: str,
+        exclude=None,
+        include=None,
+        use_gitignore=True,
+        use_default_excludes=True,
+        max_file_size=DEFAULT_MAX_FILE_SIZE,
+    ):
+        self.project_path = project_path
+        self.use_gitignore = use_gitignore
+        self.max_file_size = max_file_size
+        self.skip_virtualenvs = use_default_excludes
+        self.rules = []
+        self._loaded = set()
+        patterns = list(DEFAULT_EXCLUDES) if use_default_excludes else []
+        patterns += list(exclude or [])
+        for pattern in patterns:
+            self.rules.append(IgnoreRule(pattern))
+        self.include = [IgnoreRule(pattern) for pattern in include or []]
+
+    def load_gitignore(self, rel_dir: str) -> None:
+        """Read ``rel_dir/.gitignore`` if present and add its rules (once per folder)."""
+        if not self.use_gitignore or rel_dir in self._loaded:
+            return
+        self._loaded.add(rel_dir)
+        path = os.path.join(self.project_path, rel_dir, ".gitignore")
+        if not os.path.isfile(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.debug(f"[DEBUG] Could not read {path}: {e}")
+            return
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("\\"):
+                line = line[1:]
+            self.rules.append(IgnoreRule(line, base=rel_dir))
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        rel_path = rel_path.replace(os.sep, "/")
+        ignored = (
+            is_dir and self.skip_virtualenvs
+            and os.path.isfile(os.path.join(self.project_path, rel_path, VIRTUALENV_MARKER))
+        )
+        for rule in self.rules:
+            if rule.negated == ignored and rule.matches(rel_path, is_dir):
+                ignored = not rule.negated
+        if not ignored and not is_dir and self.include:
+            ignored = not any(rule.matches(rel_path, False) for rule in self.include)
+        return ignored
+
+    def excludes(self, rel_path: str) -> bool:
+        """
+        Whether a walk of the project would skip the file ``rel_path``, either
+        because it is ignored or because one of its folders is. Loads the
+        ``.gitignore`` files along the path.
+        """
+        parts = rel_path.replace(os.sep, "/").split("/")
+        rel_dir = ""
+        self.load_gitignore(rel_dir)
+        for part in parts[:-1]:
+            rel_dir = f"{rel_dir}/{part}" if rel_dir else part
+            if self.is_ignored(rel_dir, is_dir=True):
+                return True
+            self.load_gitignore(rel_dir)
+        return self.is_ignored(rel_path)
+
+    def too_large(self, size: int) -> bool:
+        return self.max_file_size is not None and size > self.max_file_size
+
+    def prune_dirs(self, rel_root: str, dirs: list) -> None:
+        """Remove ignored entries from ``dirs`` in place so os.walk skips them."""
+        dirs[:] = [
+            d for d in dirs
+            if not self.is_ignored(os.path.join(rel_root, d) if rel_root else d, is_dir=True)
+        ]
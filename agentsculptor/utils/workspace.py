@@ -0,0 +1,157 @@
+# utils/workspace.py
+import os
+import shutil
+import tempfile
+from agentsculptor.utils.context_cache import CACHE_DIR_NAME
+from agentsculptor.utils.ignore import IgnoreRules
+from agentsculptor.utils.logging import setup_logging, get_logger
+
+setup_logging("DEBUG")
+logger = get_logger()
+
+WORKSPACE_DIR_NAME = "workspace"
+# Generated caches are neither mirrored nor committed; the workspace builds its own
+SKIPPED_DIRS = {CACHE_DIR_NAME, "__pycache__", ".pytest_cache", ".mypy_cache", ".ruff_cache"}
+
+
+class Workspace:
+    """
+    Run-scoped copy-on-write overlay of a project.
+
+    ``open`` mirrors the project under ``.agentsculptor/workspace``: real
+    directories whose files are symlinks to the originals. Ignored folders
+    (``.git``, virtualenvs, ``build`` ...) are linked as a whole. Tools work on
+    the overlay as if it were the project; a write replaces the link with a
+    real file, so the project itself is never touched until ``commit``.
+
+    Writers must replace files (``atomic_write``) rather than write through
+    them, or the change would reach the original file.
+    """
+
+    def __init__(self, project_path: str):
+        self.project_path = os.path.abspath(project_path)
+        self.path = os.path.join(self.project_path, CACHE_DIR_NAME, WORKSPACE_DIR_NAME)
+
+    def open(self) -> str:
+        """Build the overlay (replacing a stale one) and return its path. Raises OSError."""
+        if os.path.lexists(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(self.path)
+        rules = IgnoreRules(self.project_path)
+        linked = 0
+        for root, dirs, files in os.walk(self.project_path):
+            rel_root = os.path.relpath(root, self.project_path)
+            rel_root = "" if rel_root == "." else rel_root
+            rules.load_gitignore(rel_root)
+            mirrored = []
+            for d in sorted(dirs):
+                rel_dir = os.path.join(rel_root, d)
+                if d in SKIPPED_DIRS:
+                    continue
+                if rules.is_ignored(rel_dir, is_dir=True) or os.path.islink(os.path.join(root, d)):
+                    os.symlink(os.path.join(root, d), os.path.join(self.path, rel_dir))
+                    linked += 1
+                else:
+                    os.mkdir(os.path.join(self.path, rel_dir))
+                    mirrored.append(d)
+            dirs[:] = mirrored
+            for name in files:
+                os.symlink(os.path.join(root, name), os.path.join(self.path, rel_root, name))
+                linked += 1
+        logger.debug(f"[DEBUG] Opened workspace {self.path} ({linked} links).")
+        return self.path
+
+    def staged_files(self, paths=None) -> list:
+        """
+        Project-relative paths written in the overlay (new or modified files).
+
+        With ``paths`` (the files the tools wrote) only those are considered,
+        so artifacts of test runs in the workspace are never staged. Without,
+        the overlay is scanned, skipping what the ignore rules exclude.
+        """
+        if paths is not None:
+            return sorted(
+                os.path.normpath(rel_path) for rel_path in set(paths)
+                if os.path.isfile(os.path.join(self.path, rel_path))
+                and not os.path.islink(os.path.join(self.path, rel_path))
+            )
+        rules = IgnoreRules(self.path)
+        staged = []
+        for root, dirs, files in os.walk(self.path):
+            rel_root = os.path.relpath(root, self.path)
+            rel_root = "" if rel_root == "." else rel_root
+            rules.load_gitignore(rel_root)
+            dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+            rules.prune_dirs(rel_root, dirs)
+            for name in sorted(files):
+                rel_path = os.path.join(rel_root, name)
+                if name.endswith(".pyc") or os.path.islink(os.path.join(root, name)) or rules.is_ignored(rel_path):
+                    continue
+                staged.append(rel_path)
+        return staged
+
+    def commit(self, paths=None) -> list:
+        """
+        Apply the staged files (see ``staged_files``) to the project and
+        return their paths.
+
+        Every file is first copied next to its target; only when all copies
+        succeeded are they renamed into place, so a failure leaves the
+        project unchanged. The overlay points at the new files afterwards.
+        """
+        staged = self.staged_files(paths)
+        prepared = []
+        try:
+            for rel_path in staged:
+                target = os.path.join(self.project_path, rel_path)
+                directory = os.path.dirname(target)
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(target)}.", suffix=".tmp")
+                os.close(fd)
+                prepared.append((tmp_path, target))
+                shutil.copyfile(os.path.join(self.path, rel_path), tmp_path)
+                shutil.copymode(os.path.join(self.path, rel_path), tmp_path)
+        except BaseException:
+            for tmp_path, _ in prepared:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            raise
+
+        for tmp_path, target in prepared:
+            os.replace(tmp_path, target)
+        for rel_path in staged:
+            self._relink(rel_path)
+        if staged:
+            logger.info(f"[INFO] Committed {len(staged)} staged file(s) to {self.project_path}.")
+        return staged
+
+    def rollback(self, paths=None) -> list:
+        """
+        Discard the staged files and return their paths. The project was never
+        written, so this only relinks the staged entries; no content is copied.
+        """
+        staged = self.staged_files(paths)
+        for rel_path in staged:
+            self._relink(rel_path)
+        if staged:
+            logger.info(f"[INFO] Rolled back {len(staged)} staged file(s); the project is unchanged.")
+        return staged
+
+    def _relink(self, rel_path: str) -> None:
+        view_path = os.path.join(self.path, rel_path)
+        os.remove(view_path)
+        original = os.path.join(self.project_path, rel_path)
+        if os.path.exists(original):
+            os.symlink(original, view_path)
+
+    def close(self) -> None:
+        """Remove the overlay; uncommitted changes are lost."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
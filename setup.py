@@ -20,6 +20,7 @@ setup(
         "black",
         "pytest",
         "colorlog",
+        "requests",
         # add more runtime dependencies here
     ],
     extras_require={
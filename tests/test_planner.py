@@ -0,0 +1,21 @@
+import pytest
+from agentsculptor.agent.planner import _parse_plan
+
+
+def test_truncated_plan_raises_instead_of_returning_its_first_step():
+    response = (
+        '[{"tool": "create_file", "args": {"path": "a.py", "content": "x = {1: 2}"}}, '
+        '{"tool": "run_tests", "args": {'
+    )
+    with pytest.raises(ValueError):
+        _parse_plan(response)
+
+
+def test_plan_after_unrelated_json():
+    response = 'Debug: {"debug": true}\n[{"tool": "run_tests", "args": {"path": "tests"}}]'
+    assert _parse_plan(response) == [{"tool": "run_tests", "args": {"path": "tests"}}]
+
+
+def test_json_without_tool_calls_raises():
+    with pytest.raises(ValueError):
+        _parse_plan('{"debug": true}')